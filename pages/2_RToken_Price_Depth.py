@@ -1,46 +1,22 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+from reserve_metrics import assets, rtoken_store, styling
+from reserve_metrics.figure_cache import version_cache
 
 # Set page configuration
 st.set_page_config(page_title="RToken Liquidity Analysis", layout="wide")
 
-# Function to load data
-@st.cache_data
-def load_data():
-    filename = "rtoken_liquidity.csv"
-    df = pd.read_csv(filename)
-    return df
-
-# Load the data
-df = load_data()
+# Load the weekly liquidity as (asset, date, value) rows, parsed once at ingestion
+version, df_long = rtoken_store.load_versioned('liquidity')
 
 # Create the line plot
 st.title("RToken Price Depth")
 
-# Get date columns dynamically
-date_columns = [col for col in df.columns if col not in ['Asset Name', 'Weekly Change']]
-
-# Melt the DataFrame for plotting
-df_melted = df.melt(id_vars=['Asset Name', 'Weekly Change'], 
-                    value_vars=date_columns,
-                    var_name='Week', 
-                    value_name='Value')
-
-# Convert Value column to numeric, removing $ and commas
-df_melted['Value'] = df_melted['Value'].replace('[\$,]', '', regex=True).astype(float)
-
-# Convert Week to datetime
-df_melted['Week'] = pd.to_datetime(df_melted['Week'], format='%m/%d')
-
-# Sort the DataFrame by Week
-df_melted = df_melted.sort_values('Week')
-
 # Create the plot
-fig = px.line(df_melted, x='Week', y='Value', color='Asset Name', 
+fig = px.line(df_long, x='date', y='value', color='asset',
               title='RToken Liquidity Over Time',
-              labels={'Value': 'Liquidity ($)', 'Week': 'Date'},
-              hover_data=['Asset Name', 'Value'])
+              labels={'value': 'Liquidity ($)', 'date': 'Date', 'asset': 'Asset Name'},
+              hover_data=['asset', 'value'])
 
 fig.update_layout(
     legend_title_text='Asset Name',
@@ -49,7 +25,7 @@ fig.update_layout(
     xaxis=dict(
         tickmode='auto',
         nticks=10,
-        tickformat='%m/%d'
+        tickformat='%m/%d/%y'
     )
 )
 
@@ -58,28 +34,48 @@ st.plotly_chart(fig, use_container_width=True)
 # Display the data table with conditional formatting
 st.subheader("RToken Liquidity Data")
 
-# Function to color cells based on positive/negative values
-def color_negative_red(val):
-    if isinstance(val, str) and val.endswith('%'):
-        value = float(val.rstrip('%'))
-        color = 'green' if value >= 0 else 'red'
-        return f'color: {color}'
-    return ''
+# Green for positive changes, red for negative ones
+def weekly_change_colors(changes):
+    return styling.css_from_rules(changes, [(changes >= 0, 'color: green'), (changes < 0, 'color: red')])
+
+# Table and its CSS, built once per version of the store rather than every rerun
+@version_cache()
+def liquidity_table(df_long):
+    # One row per asset, one column per week, and the change over the last week
+    df = rtoken_store.wide(df_long)
+    df.columns = df.columns.strftime('%m/%d/%y')
+    df['Weekly Change'] = rtoken_store.weekly_change(df_long)
+    df = df.rename_axis('Asset Name')
+
+    return df, weekly_change_colors(df[['Weekly Change']])
+
+# Display the styled DataFrame; the Styler itself is made anew on every render
+df, css = liquidity_table(df_long, version=version)
+weeks = df.columns.drop('Weekly Change')
+styled_df = styling.styled(df, css).format(
+    '${:,.2f}', subset=weeks, na_rep=''
+).format('{:+.2%}', subset=['Weekly Change'], na_rep='')
+st.dataframe(styled_df, use_container_width=True)
 
-# Apply the styling
-styled_df = df.style.applymap(color_negative_red, subset=['Weekly Change'])
+# Three columns of a wide page, stacked on narrow screens
+COLUMN_SIZES = "(min-width: 640px) 33vw, 100vw"
 
-# Display the styled DataFrame
-st.dataframe(styled_df, use_container_width=True)
+def show_image(name, caption):
+    # Resized variants served as static files, or the original until they're built
+    tag = assets.picture(name, COLUMN_SIZES, caption)
+    if tag is None:
+        st.image(name, caption=caption)
+    else:
+        st.markdown(tag, unsafe_allow_html=True)
 
 if st.checkbox('See Graph'):
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.image('Liquidity_comparison_9.26.24.png', caption='26 September 2024')
+        show_image('Liquidity_comparison_9.26.24.png', '26 September 2024')
     with col2:
-        st.image('Liquidity_comparison_10.4.24.png', caption='4 October 2024')
+        show_image('Liquidity_comparison_10.4.24.png', '4 October 2024')
     with col3:
-        st.image('Liquidity_comparison_10.9.24.png', caption='9 October 2024')
+        show_image('Liquidity_comparison_10.9.24.png', '9 October 2024')
 
 # Add some explanatory text
 st.markdown("""
@@ -1,20 +1,40 @@
-import pandas as pd
 import streamlit as st
+from reserve_metrics import assets, rtoken_store, styling
+from reserve_metrics.figure_cache import version_cache
 
 todays_date = 'Data: August 29th'
 last_weeks_date = 'Data: August 22nd'
-df = pd.read_csv('rtoken_safety.csv').round(2)
+# Two columns of a wide page, stacked on narrow screens
+COLUMN_SIZES = "(min-width: 640px) 50vw, 100vw"
 
+def show_image(name, caption):
+    # Resized variants served as static files, or the original until they're built
+    tag = assets.picture(name, COLUMN_SIZES, caption, full_width=True)
+    if tag is None:
+        st.image(name, caption=caption, use_column_width=True)
+    else:
+        st.markdown(tag, unsafe_allow_html=True)
 
-# Define a function to highlight values under 1 with red, with alpha of .1
-def highlight_values(val):
-    if pd.api.types.is_number(val) and val < 1:
-        return 'background-color: rgba(255, 0, 0, 0.1)'  # Red with alpha of .1
-    return ''
+# Highlight values under 1 with red, with alpha of .1
+def highlight_values(scores):
+    return styling.css_from_rules(scores, [(scores < 1, 'background-color: rgba(255, 0, 0, 0.1)')])
+
+# Table and its CSS, built once per version of the store rather than every rerun
+@version_cache()
+def safety_table(df_long):
+    # Scores per RToken and week, parsed once at ingestion
+    df = rtoken_store.wide(df_long).round(2)
+    df.columns = df.columns.strftime('%m/%d/%y')
+    df = df.rename_axis('RToken')
+
+    # Highlight the numeric columns
+    numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
+    return df, highlight_values(df[numeric_columns])
+
+# The Styler itself is made anew on every render
+version, df_long = rtoken_store.load_versioned('safety')
+styled_df = styling.styled(*safety_table(df_long, version=version))
 
-# Apply the highlighting to the DataFrame
-numeric_columns = df.select_dtypes(include=['float64', 'int64']).columns
-styled_df = df.style.applymap(highlight_values, subset=numeric_columns)
 # Streamlit app
 st.set_page_config(layout="wide")
 
@@ -59,14 +79,14 @@ if st.checkbox('View Collateral Liquidity Charts', value=False):
     st.subheader('Collateral Liquidity on DEXs')
     col1, col2 = st.columns(2)
     with col1:
-        st.image("collateral_8.29.png", caption=todays_date, use_column_width=True)
+        show_image('collateral_8.29.png', todays_date)
     with col2:
-        st.image("collateral_8.22.png", caption=last_weeks_date, use_column_width=True)
+        show_image('collateral_8.22.png', last_weeks_date)
 if st.checkbox('View ETH+ Redemption Liquidity', value=False):
 
     st.subheader('ETH+ Redemption Liquidity')
     col1, col2 = st.columns(2)
     with col1:
-        st.image("currentbasket_8.29.png", caption=todays_date, use_column_width=True)
+        show_image('currentbasket_8.29.png', todays_date)
     with col2:
-        st.image("currentbasket_8.22.png", caption=last_weeks_date, use_column_width=True)
+        show_image('currentbasket_8.22.png', last_weeks_date)
@@ -1,37 +1,37 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-from dune_client.types import QueryParameter
-from dune_client.client import DuneClient
-from dune_client.query import QueryBase
-import time
+from reserve_metrics import peg_rollups, snapshots, styling
+from reserve_metrics.disk_cache import staleness_note
+from reserve_metrics.downsample import downsample
+from reserve_metrics.dune_executions import ResultPending
+from reserve_metrics.dune_queries import PEG_QUERY_ID, PEG_TIMEPERIOD, fetch_peg_prices
+from reserve_metrics.figure_cache import version_cache
+from reserve_metrics.scheduler import start_background_refresh
 
 st.set_page_config(page_title="eUSD Price Peg", page_icon="📊")
 
-# Retrieve Dune API key from Streamlit secrets
-try:
-    dune_api_key = st.secrets["DUNE_API_KEY"]
-except KeyError:
+# The data layer reads DUNE_API_KEY from the environment, which Streamlit fills from its secrets
+# Only its presence is checked here: the page must never render the key itself
+if "DUNE_API_KEY" not in st.secrets:
     st.error("Dune API Key not found. Please set the DUNE_API_KEY secret.")
-    
     st.stop()
 
-# Function to fetch data from Dune Analytics
-@st.cache_data(ttl=3600)
+# The key is now in the environment, so the Dune jobs can be scheduled too
+start_background_refresh()
+
+# Function to fetch data from Dune Analytics, read from the refreshed snapshot;
+# its version also identifies the rollups updated along with the prices
 def fetch_dune_data(query_id, timeperiod):
-    dune = DuneClient(dune_api_key)
-    query = QueryBase(
-        query_id=query_id,
-        params=[QueryParameter.text_type(name="timeperiod", value=timeperiod)]
-    )
-    results = dune.run_query_dataframe(query)
-    return results
+    return snapshots.current('peg.prices', lambda: fetch_peg_prices(query_id, timeperiod))
 
 st.title("eUSD Price Peg")
 
 # Sidebar for user input
-query_id = 3950965  # Your specific query ID
-timeperiod = "day"
+query_id = PEG_QUERY_ID
+timeperiod = PEG_TIMEPERIOD
+
+# Chart width in pixels, which is also the number of points charted per network
+CHART_WIDTH = 800
 
 # Define the color scheme
 network_colors = {
@@ -40,43 +40,60 @@ network_colors = {
     'Arbitrum': '#00af50'
 }
 
-# Define legend data
+# Define legend data; the bands themselves are shared with the peg rollups
+band_colors = {
+    "Excellent": "rgba(0, 255, 0, 0.1)",
+    "Good": "rgba(255, 255, 0, 0.1)",
+    "Fair": "rgba(255, 165, 0, 0.1)",
+    "Poor": "rgba(255, 0, 0, 0.1)",
+}
 legend_data = [
-    {"range": (0.999, 1.001), "color": "rgba(0, 255, 0, 0.1)", "description": "Excellent"},
-    {"range": (0.998, 1.002), "color": "rgba(255, 255, 0, 0.1)", "description": "Good"},
-    {"range": (0.995, 1.005), "color": "rgba(255, 165, 0, 0.1)", "description": "Fair"},
-    {"range": (0.990, 1.010), "color": "rgba(255, 0, 0, 0.1)", "description": "Poor"}
+    {"range": (low, high), "color": band_colors[name], "description": name}
+    for name, low, high in peg_rollups.BANDS
 ]
 
-# Highlight function
-def highlight_outliers(val):
-    if pd.isna(val):
-        return ''
-    for item in legend_data:
-        if item["range"][0] <= val <= item["range"][1]:
-            return f'background-color: {item["color"]}'
-    return ''
+# Highlight every price with the color of the tightest band containing it
+def highlight_outliers(prices):
+    return styling.css_from_rules(prices, [
+        ((prices >= item["range"][0]) & (prices <= item["range"][1]), f'background-color: {item["color"]}')
+        for item in legend_data
+    ])
+
+# Monthly average table, from the precomputed monthly rollups, and its CSS;
+# built once per version of the prices rather than every rerun
+@version_cache()
+def monthly_table():
+    monthly = peg_rollups.read_monthly()
+    monthly_avg_df = monthly.pivot(index='month', columns='network', values='avg_price')
+    monthly_avg_df.index = monthly_avg_df.index.strftime('%B')
+
+    average_row = monthly_avg_df.mean().to_frame().T
+    average_row.index = ['Average']
+    monthly_avg_df_with_avg = pd.concat([monthly_avg_df, average_row])
+    return monthly_avg_df_with_avg, highlight_outliers(monthly_avg_df_with_avg)
 
 # Function to display the main content
-def display_content(df):
-    df['hour'] = pd.to_datetime(df['hour'])
-    df_long = df.melt(
-        id_vars='hour', 
-        value_vars=['avg_price_ethereum', 'avg_price_base', 'avg_price_arbitrum'],
-        var_name='network', 
-        value_name='avg_price'
-    )
-    df_long['network'] = df_long['network'].replace({
-        'avg_price_ethereum': 'Ethereum',
-        'avg_price_base': 'Base',
-        'avg_price_arbitrum': 'Arbitrum'
-    })
-    df_long['avg_price'] = pd.to_numeric(df_long['avg_price'], errors='coerce')
+def display_content(df_long, version):
+    # Imported here, so the page shows its title and any pending message first
+    import altair as alt
+
+    # Prices arrive long and typed from the peg store: hour, network, avg_price
+
+    # Chart only the selected range, at most one min and one max per pixel
+    # column and network so every excursion from the peg stays visible
+    first, last = df_long['hour'].min().to_pydatetime(), df_long['hour'].max().to_pydatetime()
+    if first < last:
+        start, end = st.slider("Date range", min_value=first, max_value=last, value=(first, last), format="YYYY-MM-DD")
+    else:
+        # A single stored hour: there is no range to pick, and st.slider
+        # rejects equal bounds
+        start, end = first, last
+    df_chart = downsample(df_long, 'hour', 'avg_price', max_points=CHART_WIDTH, by='network', method='minmax', start=start, end=end)
 
     # Create Altair chart with selection
     selection = alt.selection_point(fields=['network'], bind='legend')
     
-    chart = alt.Chart(df_long).mark_line().encode(
+    chart = alt.Chart(df_chart).mark_line().encode(
         x='hour:T',
         y=alt.Y('avg_price:Q', scale=alt.Scale(domain=[0.985, 1.015]), title='Average Price'),
         color=alt.Color('network:N', scale=alt.Scale(domain=list(network_colors.keys()), range=list(network_colors.values()))),
@@ -84,7 +101,7 @@ def display_content(df):
     ).add_selection(
         selection
     ).properties(
-        width=800,
+        width=CHART_WIDTH,
         height=400
     ).interactive()
 
@@ -92,29 +109,50 @@ def display_content(df):
 
     # Monthly average table
     try:
-        monthly_avg_df = df_long.set_index('hour').groupby('network').resample('M')['avg_price'].mean().unstack(level=0)
-        monthly_avg_df.index = monthly_avg_df.index.strftime('%B')
-
-        average_row = monthly_avg_df.mean().to_frame().T
-        average_row.index = ['Average']
-        monthly_avg_df_with_avg = pd.concat([monthly_avg_df, average_row])
-
+        # The Styler itself is made anew on every render
+        styled_monthly = styling.styled(*monthly_table(version=version))
         st.subheader("Monthly Averages")
-        st.dataframe(monthly_avg_df_with_avg.style.applymap(highlight_outliers), use_container_width=True)
+        st.dataframe(styled_monthly, use_container_width=True)
     except Exception as e:
         st.error(f"An error occurred while calculating monthly averages: {str(e)}")
 
-# Main execution
-if 'data' not in st.session_state:
-    with st.spinner("Loading initial data... This may take up to 30 seconds."):
-        try:
-            df = fetch_dune_data(query_id, timeperiod)
-            st.session_state.data = df
-        except Exception as e:
-            st.error(f"An error occurred while fetching initial data: {str(e)}")
-
-if 'data' in st.session_state:
-    display_content(st.session_state.data)
+    # Peg quality: share of hours spent in each band and the depeg episodes
+    st.subheader("Time in Band")
+    time_in_band = peg_rollups.read_time_in_band()
+    band_format = {column: "{:.1%}" for column in time_in_band.columns if column != 'Max Deviation'}
+    band_format['Max Deviation'] = "{:.2%}"
+    st.dataframe(time_in_band.style.format(band_format), use_container_width=True)
+
+    st.subheader("Depeg Episodes")
+    episodes = peg_rollups.read_episodes()
+    if episodes.empty:
+        st.write(f"No hour has been more than {peg_rollups.DEPEG_THRESHOLD:.1%} away from $1.")
+    else:
+        episodes = episodes.rename(columns={
+            'network': 'Network', 'start': 'Start', 'end': 'End', 'samples': 'Hours',
+            'worst_price': 'Worst Price', 'max_deviation': 'Max Deviation',
+        })
+        st.dataframe(episodes.style.format({'Worst Price': "{:.4f}", 'Max Deviation': "{:.2%}"}), use_container_width=True)
+
+# Main execution: every session reads the shared snapshot, so a refresh
+# shows up on the next rerun without reloading the page
+with st.spinner("Loading initial data..."):
+    try:
+        prices = fetch_dune_data(query_id, timeperiod)
+    except ResultPending as e:
+        # First run of the query: it executes in the background
+        prices = None
+        st.info(str(e))
+        st.button("Check again")
+    except Exception as e:
+        prices = None
+        st.error(f"An error occurred while fetching initial data: {str(e)}")
+
+if prices is not None:
+    note = staleness_note(fetch_peg_prices.info(query_id, timeperiod))
+    if note:
+        st.caption(note)
+    display_content(prices.value, prices.version)
 
 st.sidebar.subheader("Legend")
 
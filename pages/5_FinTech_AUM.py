@@ -1,30 +1,25 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-from dune_client.client import DuneClient
+from reserve_metrics import fintech, snapshots
+from reserve_metrics.disk_cache import staleness_note
+from reserve_metrics.downsample import downsample
+from reserve_metrics.dune_queries import FINTECH_AUM_QUERY_ID, fetch_fintech_balances
+from reserve_metrics.scheduler import start_background_refresh
 
 st.set_page_config(page_title="FinTech AUM", page_icon="📊", layout="wide")
 
-# Retrieve Dune API key from Streamlit secrets
-try:
-    dune_api_key = st.secrets["DUNE_API_KEY"]
-except KeyError:
+# The data layer reads DUNE_API_KEY from the environment, which Streamlit fills from its secrets
+# Only its presence is checked here: the page must never render the key itself
+if "DUNE_API_KEY" not in st.secrets:
     st.error("Dune API Key not found. Please set the DUNE_API_KEY secret.")
     st.stop()
 
-# Function to fetch data from Dune Analytics
-@st.cache_data(ttl=3600)
-def fetch_dune_data(query_id):
-    dune = DuneClient(dune_api_key)
-    results = dune.get_latest_result_dataframe(query_id)
-    return results
+# The key is now in the environment, so the Dune jobs can be scheduled too
+start_background_refresh()
 
-# Function to safely convert to numeric
-def safe_numeric(val):
-    try:
-        return pd.to_numeric(val)
-    except ValueError:
-        return 0
+# Function to fetch data from Dune Analytics, read from the refreshed snapshot
+def fetch_dune_data(query_id):
+    return snapshots.latest('fintech.aum', lambda: fetch_fintech_balances(query_id))
 
 # Function to format currency
 def format_currency(value):
@@ -32,90 +27,77 @@ def format_currency(value):
 
 st.title("FinTech AUM")
 
+# Chart width in pixels, which also caps the dates charted
+CHART_WIDTH = 800
+
 # Fetch data
-query_id = 4019395
+query_id = FINTECH_AUM_QUERY_ID
 df = fetch_dune_data(query_id)
+note = staleness_note(fetch_fintech_balances.info(query_id))
+if note:
+    st.caption(note)
 
-# Data preprocessing
-df['date'] = pd.to_datetime(df['date'])
-for col in ['ugly_cash_base_balance', 'ugly_cash_eth_balance', 'sentz_base_balance', 'sentz_eth_balance']:
-    df[col] = df[col].apply(safe_numeric)
-
-df['ugly_cash_total'] = df['ugly_cash_base_balance'] + df['ugly_cash_eth_balance']
-df['sentz_total'] = df['sentz_base_balance'] + df['sentz_eth_balance']
-df['total_aum'] = df['ugly_cash_total'] + df['sentz_total']
-
-# Sort dataframe with most recent date at the top
-df = df.sort_values('date', ascending=False)
+# Data preprocessing: numeric balances and per-company totals by date
+balances = fintech.process_balances(df)
 
 # Add company selection in sidebar
 st.sidebar.title("Settings")
-selected_company = st.sidebar.radio("Select FinTech Company", ["All", "Ugly Cash", "Sentz"])
+selected_company = st.sidebar.radio("Select FinTech Company", ["All"] + fintech.COMPANY_NAMES)
+window = st.sidebar.radio("Compare With", list(fintech.WINDOWS), index=list(fintech.WINDOWS).index('30d'))
 
 # Filter data based on selection
-if selected_company == "Ugly Cash":
-    chart_data = df[['date', 'ugly_cash_total']].rename(columns={'ugly_cash_total': 'balance'})
-    chart_data['company'] = 'Ugly Cash'
-elif selected_company == "Sentz":
-    chart_data = df[['date', 'sentz_total']].rename(columns={'sentz_total': 'balance'})
-    chart_data['company'] = 'Sentz'
-else:
-    chart_data = df.melt(id_vars=['date'], value_vars=['ugly_cash_total', 'sentz_total'], 
-                         var_name='company', value_name='balance')
-    chart_data['company'] = chart_data['company'].map({'ugly_cash_total': 'Ugly Cash', 'sentz_total': 'Sentz'})
+selected = fintech.COMPANY_NAMES if selected_company == "All" else [selected_company]
+chart_data = fintech.chart_data(balances, selected)
+
+# Chart about one date per pixel; companies keep the same dates so the
+# areas still stack, and LTTB keeps balance spikes in
+chart_data = downsample(chart_data, 'date', 'balance', max_points=CHART_WIDTH, by='company', shared=True)
 
 # Create stacked area chart
-chart = alt.Chart(chart_data).mark_area().encode(
-    x='date:T',
-    y=alt.Y('balance:Q', stack='zero'),
-    color=alt.Color('company:N', scale=alt.Scale(domain=['Ugly Cash', 'Sentz'],
-                                                 range=['#ff8452', '#6d38ff'])),
-    tooltip=['date', 'company', 'balance']
-).properties(
-    width=800,
-    height=400
-).interactive()
+def create_area_chart(chart_data):
+    # Imported here, so altair only loads once there is data to chart
+    import altair as alt
+
+    return alt.Chart(chart_data).mark_area().encode(
+        x='date:T',
+        y=alt.Y('balance:Q', stack='zero'),
+        color=alt.Color('company:N', scale=alt.Scale(domain=fintech.COMPANY_NAMES,
+                                                     range=[company.color for company in fintech.COMPANIES])),
+        tooltip=['date', 'company', 'balance']
+    ).properties(
+        width=CHART_WIDTH,
+        height=400
+    ).interactive()
 
 # Display the chart
-st.altair_chart(chart, use_container_width=True)
+st.altair_chart(create_area_chart(chart_data), use_container_width=True)
 
-# Calculate monthly changes
-latest_date = df['date'].max()
-month_ago_date = latest_date - pd.Timedelta(days=30)
+# Current balances and their change over the selected window
+stats = fintech.changes(balances, fintech.WINDOWS[window])
 
-latest_data = df.iloc[0]
-month_ago_data = df[df['date'] <= month_ago_date].iloc[0]
-
-# Display current balances and monthly changes
+# Display current balances and changes
 st.subheader('FinTech eUSD Balances')
-col1, col2, col3 = st.columns(3)
-def display_company_stats(column, company, current, month_ago):
+columns = st.columns(len(fintech.COMPANIES) + 1)
+def display_company_stats(column, company, current, change):
     with column:
         st.markdown(f"### {company}:")
         st.markdown(f"## {format_currency(current)}")
-        monthly_change = current - month_ago
-        #change_color = "green" if monthly_change >= 0 else "red"
-        st.markdown(f'<span>Monthly Change: {format_currency(monthly_change)}</span>', unsafe_allow_html=True)
-
-if selected_company in ["All", "Ugly Cash"]:
-    display_company_stats(col1, "Ugly Cash", latest_data['ugly_cash_total'], month_ago_data['ugly_cash_total'])
+        change_text = "n/a" if pd.isna(change) else format_currency(change)
+        st.markdown(f'<span>{window} Change: {change_text}</span>', unsafe_allow_html=True)
 
-if selected_company in ["All", "Sentz"]:
-    display_company_stats(col2, "Sentz", latest_data['sentz_total'], month_ago_data['sentz_total'])
+for column, company in zip(columns, fintech.COMPANY_NAMES):
+    if company in selected:
+        display_company_stats(column, company, stats.at[company, 'current'], stats.at[company, 'change'])
 
 # Display total AUM
-current_total_aum = latest_data['total_aum'] if selected_company == "All" else (
-    latest_data['ugly_cash_total'] if selected_company == "Ugly Cash" else latest_data['sentz_total']
-)
-month_ago_total_aum = month_ago_data['total_aum'] if selected_company == "All" else (
-    month_ago_data['ugly_cash_total'] if selected_company == "Ugly Cash" else month_ago_data['sentz_total']
-)
-display_company_stats(col3, "Total AUM", current_total_aum, month_ago_total_aum)
+total = stats.loc[fintech.TOTAL if selected_company == "All" else selected_company]
+display_company_stats(columns[-1], fintech.TOTAL, total['current'], total['change'])
 st.markdown("---")
 
 # Option to view raw data
 if st.checkbox('View detailed FinTech Data', value=True):
-    st.dataframe(df)
+    # Most recent date at the top
+    st.dataframe(balances.sort_index(ascending=False))
 
 
 # Footer
@@ -0,0 +1,5 @@
+"""Fetchers, processors and stores behind the Reserve health metrics dashboard.
+
+Nothing here imports Streamlit; the pages only read what these modules
+compute. `python -m reserve_metrics` computes every dataset in one batch.
+"""
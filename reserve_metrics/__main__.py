@@ -0,0 +1,50 @@
+"""Compute every dashboard dataset in one batch process.
+
+    $ python -m reserve_metrics [--output DIR] [--only NAME ...]
+
+Refreshes each dataset's sources, which updates the caches and stores under
+DATA_DIR that the pages read, and with --output also writes every frame to
+DIR as Parquet. Exits with status 1 if any dataset failed, so it can run
+as a scheduled job.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from reserve_metrics.datasets import DATASETS, DATASETS_BY_NAME, write_frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reserve_metrics", description="Compute every dashboard dataset.")
+    parser.add_argument("--output", type=Path, help="also write every frame to this directory as Parquet")
+    parser.add_argument("--only", nargs="+", choices=sorted(DATASETS_BY_NAME), metavar="NAME",
+                        help=f"datasets to compute (default all): {', '.join(DATASETS_BY_NAME)}")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    datasets = DATASETS if args.only is None else [DATASETS_BY_NAME[name] for name in args.only]
+    failed = []
+    for dataset in datasets:
+        if dataset.needs_dune and not os.environ.get("DUNE_API_KEY"):
+            print(f"{dataset.name}: skipped, DUNE_API_KEY is not set")
+            continue
+        start = time.perf_counter()
+        try:
+            frames = dataset.compute()
+            if args.output is not None:
+                write_frames(frames, args.output)
+        except Exception as e:
+            logging.getLogger(__name__).exception("Computing %s failed", dataset.name)
+            print(f"{dataset.name}: failed: {e}")
+            failed.append(dataset.name)
+            continue
+        rows = ", ".join(f"{name} {len(df)}" for name, df in frames.items())
+        print(f"{dataset.name}: {rows} rows in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
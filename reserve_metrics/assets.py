@@ -0,0 +1,149 @@
+"""Resized and compressed variants of the dashboard's images.
+
+`build` writes WebP and PNG variants of images in the repository root at
+each of WIDTHS narrower than the original, a copy of the original and a
+manifest describing them, into static/assets. Streamlit serves that
+directory as-is at app/static/ (server.enableStaticServing in
+.streamlit/config.toml), so the browser gets the variant files
+themselves; st.image would re-encode whatever it's given to PNG or JPEG.
+
+The variants are build output, made at deploy time rather than while a
+page renders:
+
+    $ python -m reserve_metrics.assets
+
+Pages ask `picture` for a <picture> tag listing every variant of an image
+with the width it's rendered at, and the browser downloads the smallest
+one at least that wide. Images missing from the manifest, or changed since
+it was built, get None, and pages show the original file instead.
+"""
+import hashlib
+import html
+import json
+import shutil
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+ASSETS_DIR = ROOT / "static" / "assets"
+MANIFEST_PATH = ASSETS_DIR / "manifest.json"
+# Where Streamlit serves ASSETS_DIR, relative to any page's URL
+ASSETS_URL = "app/static/assets"
+
+WIDTHS = (250, 400, 600, 800, 1200)
+
+WEBP_QUALITY = 85
+
+_manifest = None
+
+
+def _sha1(path):
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _save(image, path, fmt):
+    if fmt == "webp":
+        image.save(path, "WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(path, "PNG", optimize=True)
+
+
+def build(sources=None):
+    """Write the variants of `sources` (default every PNG in the root) and
+    add them to the manifest, which is returned."""
+    global _manifest
+    from PIL import Image
+
+    sources = sorted(ROOT.glob("*.png")) if sources is None else [Path(source) for source in sources]
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = dict(_load_manifest())
+    for source in sources:
+        with Image.open(source) as original:
+            original.load()
+            image = original.convert("RGBA")
+        variants = []
+        for width in WIDTHS:
+            if width >= image.width:
+                break
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in ("webp", "png"):
+                path = ASSETS_DIR / f"{source.stem}.{width}w.{fmt}"
+                _save(resized, path, fmt)
+                variants.append({"width": width, "format": fmt, "path": path.name, "bytes": path.stat().st_size})
+        # Full size: a WebP, usually much smaller, and the original PNG
+        path = ASSETS_DIR / f"{source.stem}.webp"
+        _save(image, path, "webp")
+        variants.append({"width": image.width, "format": "webp", "path": path.name, "bytes": path.stat().st_size})
+        shutil.copyfile(source, ASSETS_DIR / source.name)
+        variants.append({"width": image.width, "format": "png", "path": source.name, "bytes": source.stat().st_size})
+        manifest[source.name] = {
+            "sha1": _sha1(source),
+            "width": image.width,
+            "height": image.height,
+            "bytes": source.stat().st_size,
+            "variants": variants,
+        }
+    temporary = MANIFEST_PATH.with_suffix(".tmp")
+    temporary.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    temporary.replace(MANIFEST_PATH)
+    _manifest = manifest
+    return manifest
+
+
+def _load_manifest():
+    global _manifest
+    if _manifest is None:
+        try:
+            manifest = json.loads(MANIFEST_PATH.read_text())
+        except (OSError, ValueError):
+            manifest = {}
+        # Drop entries whose source changed since they were built
+        _manifest = {
+            name: entry for name, entry in manifest.items()
+            if (ROOT / name).exists() and _sha1(ROOT / name) == entry["sha1"]
+        }
+    return _manifest
+
+
+def _srcset(entry, fmt):
+    variants = sorted((v for v in entry["variants"] if v["format"] == fmt), key=lambda v: v["width"])
+    return ", ".join(f"{ASSETS_URL}/{v['path']} {v['width']}w" for v in variants)
+
+
+def picture(name, sizes, caption=None, width=None, full_width=False):
+    """<picture> tag showing image `name`, or None if it has no variants.
+
+    `sizes` is the width the image is rendered at, as the HTML sizes
+    attribute takes it ("250px", "(min-width: 640px) 50vw, 100vw"); the
+    browser picks the narrowest variant at least that wide for the screen's
+    pixel density. The image is shown `width` pixels wide (default its own
+    width), or fills its container with `full_width`, like st.image.
+    """
+    entry = _load_manifest().get(name)
+    if entry is None:
+        return None
+    width = "100%" if full_width else f"{width or entry['width']}px"
+    tag = (
+        f'<picture>'
+        f'<source type="image/webp" srcset="{_srcset(entry, "webp")}" sizes="{sizes}">'
+        f'<img src="{ASSETS_URL}/{name}" srcset="{_srcset(entry, "png")}" sizes="{sizes}" '
+        f'width="{entry["width"]}" height="{entry["height"]}" alt="{html.escape(caption or name)}" '
+        f'style="width: {width}; max-width: 100%; height: auto;">'
+        f'</picture>'
+    )
+    if caption is not None:
+        tag = (
+            f'<figure style="margin: 0;">{tag}'
+            f'<figcaption style="text-align: center; font-size: 14px; opacity: 0.6;">{html.escape(caption)}</figcaption>'
+            f'</figure>'
+        )
+    return tag
+
+
+if __name__ == "__main__":
+    manifest = build()
+    for name, entry in manifest.items():
+        smallest = min(entry["variants"], key=lambda v: v["bytes"])
+        print(f"{name}: {entry['bytes']:,} bytes, {len(entry['variants'])} variants "
+              f"down to {smallest['bytes']:,} bytes ({smallest['path']})")
+    print(f"Wrote {MANIFEST_PATH}")
@@ -0,0 +1,72 @@
+"""Run independent data sources concurrently on an asyncio event loop.
+
+A source is a zero-argument callable, either a coroutine function or a plain
+blocking function; blocking ones run in worker threads, so they share the
+pooled Morpho connection. Each source has its own timeout, and a failing or
+slow source does not prevent the others from returning.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TIMEOUT = float(os.environ.get("SOURCE_TIMEOUT", 30))
+
+# Long-lived pool for blocking sources. asyncio.run() waits for its default
+# executor on shutdown, which would let a timed-out source hold up the page.
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("SOURCE_WORKERS", 8)))
+
+
+class SourceError:
+    # Why a source produced no result; kept instead of raising so callers can
+    # render partial data
+
+    def __init__(self, name, error, elapsed):
+        self.name = name
+        self.error = error
+        self.elapsed = elapsed
+        self.timed_out = isinstance(error, asyncio.TimeoutError)
+
+    def __str__(self):
+        if self.timed_out:
+            return f"{self.name} timed out after {self.elapsed:.1f}s"
+        return f"{self.name} failed: {self.error}"
+
+
+async def _run_source(name, fetch, timeout):
+    start = time.monotonic()
+    try:
+        if asyncio.iscoroutinefunction(fetch):
+            result = await asyncio.wait_for(fetch(), timeout)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await asyncio.wait_for(loop.run_in_executor(_executor, fetch), timeout)
+        return name, result, None
+    except Exception as e:
+        return name, None, SourceError(name, e, time.monotonic() - start)
+
+
+async def load_sources_async(sources, timeouts=None, default_timeout=DEFAULT_TIMEOUT):
+    timeouts = timeouts or {}
+    runs = [
+        _run_source(name, fetch, timeouts.get(name, default_timeout))
+        for name, fetch in sources.items()
+    ]
+
+    results, errors = {}, {}
+    for name, result, error in await asyncio.gather(*runs):
+        if error is None:
+            results[name] = result
+        else:
+            errors[name] = error
+    return results, errors
+
+
+def load_sources(sources, timeouts=None, default_timeout=DEFAULT_TIMEOUT):
+    """Run every source concurrently and wait for all of them.
+
+    Returns `(results, errors)`, two dicts keyed by source name. Total wall
+    time is that of the slowest source, capped by its timeout. A timed-out
+    blocking source keeps running in its thread, but its result is dropped.
+    """
+    return asyncio.run(load_sources_async(sources, timeouts, default_timeout))
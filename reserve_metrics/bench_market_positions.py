@@ -0,0 +1,122 @@
+"""Benchmark of process_market_positions against the original per-position
+loop, on synthetic positions:
+
+    $ python -m reserve_metrics.bench_market_positions [sizes...]
+
+The loop and the synthetic positions are also what tests/test_lending.py
+checks parity against.
+"""
+import random
+import sys
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from reserve_metrics.lending import process_market_positions
+from reserve_metrics.markets import COLLATERAL_DECIMALS, MARKETS
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def legacy_process_market_positions(pages, rename_dict=None):
+    # The original loop, kept as the reference for the parity test; the only
+    # change is scaling collateral by the registry's decimals instead of 10**18
+    rename_dict = rename_dict or {}
+    totals = defaultdict(lambda: {
+        "totalSupplyAssets": 0,
+        "totalSupplyAssetsUsd": 0,
+        "totalBorrowAssets": 0,
+        "totalBorrowAssetsUsd": 0,
+        "totalCollateral": 0,
+        "totalCollateralUsd": 0,
+        "uniqueBorrowers": set(),
+        "uniqueInteractions": set(),
+        "collateralSymbol": ""
+    })
+
+    for items in pages:
+        for item in items:
+            market_key = item['market']['uniqueKey']
+            totals[market_key]["totalSupplyAssets"] += (float(item['supplyAssets']) / 10 ** 18)
+            totals[market_key]["totalSupplyAssetsUsd"] += item['supplyAssetsUsd']
+            totals[market_key]["totalBorrowAssets"] += (float(item['borrowAssets']) / 10 ** 18)
+            totals[market_key]["totalBorrowAssetsUsd"] += item['borrowAssetsUsd']
+            totals[market_key]["totalCollateral"] += float(item['collateral']) / 10 ** COLLATERAL_DECIMALS.get(market_key, 18)
+            totals[market_key]["totalCollateralUsd"] += item['collateralUsd'] or 0
+
+            if not totals[market_key]["collateralSymbol"]:
+                totals[market_key]["collateralSymbol"] = item['market']['collateralAsset']['symbol']
+
+            user_address = item['user']['address']
+            if float(item['borrowAssetsUsd']) > 5:
+                totals[market_key]["uniqueBorrowers"].add(user_address)
+            if float(item['supplyAssetsUsd']) >= 0 or float(item['borrowAssetsUsd']) >= 0:
+                totals[market_key]["uniqueInteractions"].add(user_address)
+
+    final_results = {}
+    for market_key, data in totals.items():
+        market_name = rename_dict.get(market_key, market_key)
+        final_results[market_name] = {
+            "Total Supply": data["totalSupplyAssetsUsd"],
+            "Total Borrowed": data["totalBorrowAssetsUsd"],
+            "Available Liquidity": data["totalSupplyAssetsUsd"] - data["totalBorrowAssetsUsd"],
+            "Utilization": data["totalBorrowAssetsUsd"] / data["totalSupplyAssetsUsd"] if data["totalSupplyAssetsUsd"] != 0 else 0,
+            "Current Borrowers": len(data["uniqueBorrowers"]),
+            "Total Collateral": data["totalCollateral"],
+            "Total Collateral USD": data["totalCollateralUsd"],
+            "Collateral Asset": data["collateralSymbol"]
+        }
+
+    return pd.DataFrame(final_results).T
+
+
+def synthetic_pages(n, page_size=1000, seed=0):
+    # Positions shaped like the marketPositions API response; users repeat
+    # across markets, some positions are empty and some lack a USD collateral
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        market = rng.randrange(len(MARKETS))
+        borrowing = rng.random() < 0.4
+        items.append({
+            'supplyShares': str(rng.randint(0, 10 ** 24)),
+            'supplyAssets': str(rng.randint(0, 10 ** 24)),
+            'supplyAssetsUsd': rng.random() * 1e5,
+            'borrowShares': str(rng.randint(0, 10 ** 24) if borrowing else 0),
+            'borrowAssets': str(rng.randint(0, 10 ** 24) if borrowing else 0),
+            'borrowAssetsUsd': rng.random() * 1e5 if borrowing else rng.random() * 10,
+            'collateral': str(rng.randint(0, 10 ** 24)),
+            'collateralUsd': None if rng.random() < 0.1 else rng.random() * 1e5,
+            'market': {
+                'uniqueKey': MARKETS[market].key,
+                'loanAsset': {'address': f"0x{market:040x}", 'symbol': "eUSD"},
+                'collateralAsset': {'address': f"0x{market + 100:040x}", 'symbol': MARKETS[market].collateral},
+            },
+            'user': {'address': f"0x{rng.randrange(max(n // 3, 1)):040x}"},
+        })
+    return [items[start:start + page_size] for start in range(0, n, page_size)]
+
+
+def timed(fn, pages, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    print(f"{'positions':>10} {'loop':>10} {'current':>10} {'speedup':>8}")
+    for n in sizes:
+        pages = synthetic_pages(n)
+        loop = timed(legacy_process_market_positions, pages)
+        current = timed(process_market_positions, pages)
+        print(f"{n:>10,} {loop * 1000:>8.1f}ms {current * 1000:>8.1f}ms {loop / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    main(sizes)
@@ -0,0 +1,94 @@
+"""Every dataset the dashboard shows, computed without Streamlit.
+
+Each dataset refreshes its sources through the same cached fetchers the
+pages read, so a batch run leaves the pages fresh results to serve, and
+returns its frames by name for writing to disk.
+
+    $ python -m reserve_metrics --output exports/
+"""
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from reserve_metrics.markets import VAULTS
+
+# `compute` returns {frame name: DataFrame}; datasets with `needs_dune` are
+# skipped without a DUNE_API_KEY
+Dataset = namedtuple("Dataset", ["name", "compute", "needs_dune"])
+
+
+def lending_markets():
+    from reserve_metrics import lending
+
+    df_market, df_market_positions, suppliers = lending.fetch_market_sources.refresh()
+    ethmainnet_suppliers, base_suppliers, ethmainnet_vaultsupply, base_vaultsupply = suppliers
+    vaults = pd.DataFrame(
+        {'suppliers': [ethmainnet_suppliers, base_suppliers], 'supplied_usd': [ethmainnet_vaultsupply, base_vaultsupply]},
+        index=pd.Index([VAULTS['mainnet'].label, VAULTS['base'].label], name='vault'),
+    )
+    return {'markets': df_market, 'market_positions': df_market_positions, 'vault_suppliers': vaults}
+
+
+def lending_liquidations():
+    from reserve_metrics import lending
+
+    return {'liquidations': lending.fetch_liquidations.refresh()}
+
+
+def peg_prices():
+    from reserve_metrics import dune_queries, peg_rollups
+    from reserve_metrics.dune_executions import EXECUTION_TIMEOUT, POLL_INTERVAL, ResultPending
+
+    # A batch job can wait for the first execution of the query
+    deadline = time.time() + EXECUTION_TIMEOUT
+    while True:
+        try:
+            prices = dune_queries.fetch_peg_prices.refresh(dune_queries.PEG_QUERY_ID, dune_queries.PEG_TIMEPERIOD)
+            break
+        except ResultPending:
+            if time.time() > deadline:
+                raise
+            time.sleep(POLL_INTERVAL)
+    return {
+        'peg_prices': prices,
+        'peg_monthly': peg_rollups.read_monthly(),
+        'peg_time_in_band': peg_rollups.read_time_in_band(),
+        'peg_episodes': peg_rollups.read_episodes(),
+    }
+
+
+def fintech_balances():
+    from reserve_metrics import dune_queries, fintech
+
+    df = dune_queries.fetch_fintech_balances.refresh(dune_queries.FINTECH_AUM_QUERY_ID)
+    return {'fintech_balances': fintech.process_balances(df)}
+
+
+def rtoken_sheets():
+    from reserve_metrics import rtoken_store
+
+    return {f"rtoken_{name}": rtoken_store.ingest(name) for name in rtoken_store.SHEETS}
+
+
+DATASETS = [
+    Dataset("lending.markets", lending_markets, False),
+    Dataset("lending.liquidations", lending_liquidations, False),
+    Dataset("peg.prices", peg_prices, True),
+    Dataset("fintech.aum", fintech_balances, True),
+    Dataset("rtoken.sheets", rtoken_sheets, False),
+]
+
+DATASETS_BY_NAME = {dataset.name: dataset for dataset in DATASETS}
+
+
+def write_frames(frames, directory):
+    # One Parquet file per frame; returns the paths written
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, df in frames.items():
+        path = directory / f"{name}.parquet"
+        # Parquet needs string column labels
+        df.rename(columns=str).to_parquet(path)
+        paths.append(path)
+    return paths
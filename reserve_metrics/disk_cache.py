@@ -0,0 +1,224 @@
+"""Persistent, stale-while-revalidate cache for remote fetchers.
+
+Results are pickled under data/cache so they survive restarts and redeploys.
+Once a result is older than its TTL it is still returned immediately while a
+background thread fetches a fresh one. Repeated upstream failures open a
+circuit breaker: no fetches are attempted for a cooldown period and the last
+good result keeps being served.
+
+Returned values are shared between callers and must be treated as read-only.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from reserve_metrics.storage import DATA_DIR
+
+CACHE_DIR = DATA_DIR / "cache"
+
+# Caches survive Streamlit reruns, which re-execute the decorators
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _cache_name(fn):
+    # Streamlit runs every page as __main__, so name caches after the defining file
+    return f"{Path(fn.__code__.co_filename).stem}.{fn.__qualname__}"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CacheInfo:
+    # What the caller needs to label a result: its age and whether it is current
+
+    def __init__(self, fetched_at, ttl, circuit_open, last_error):
+        self.fetched_at = fetched_at
+        self.age = None if fetched_at is None else time.time() - fetched_at
+        self.stale = self.age is not None and self.age > ttl
+        self.circuit_open = circuit_open
+        self.last_error = last_error
+
+
+class PersistentCache:
+
+    def __init__(self, fn, ttl, failure_threshold, cooldown, passthrough=()):
+        self.fn = fn
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.passthrough = passthrough
+        self.directory = CACHE_DIR / _cache_name(fn)
+        self._memory = {}
+        # Modification time of the file each memory entry was read from or written to
+        self._mtimes = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        # One fetch per key at a time, so concurrent cold callers share it
+        self._key_locks = defaultdict(threading.Lock)
+        self._failures = 0
+        self._open_until = 0
+        self._last_error = None
+
+    def _key(self, args, kwargs):
+        payload = pickle.dumps((args, sorted(kwargs.items())))
+        return hashlib.sha256(payload).hexdigest()[:32]
+
+    def _load(self, key):
+        # The file is checked on every call so results written by another
+        # process, such as the batch CLI, replace the copy in memory
+        path = self.directory / f"{key}.pkl"
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return self._memory.get(key)
+        if key in self._memory and self._mtimes.get(key) == mtime:
+            return self._memory[key]
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return self._memory.get(key)
+        self._memory[key] = entry
+        self._mtimes[key] = mtime
+        return entry
+
+    def _store(self, key, value):
+        entry = (time.time(), value)
+        self._memory[key] = entry
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{key}.pkl"
+            tmp = self.directory / f"{key}.pkl.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp, path)
+            self._mtimes[key] = path.stat().st_mtime_ns
+        except OSError:
+            # Still cached in memory for this process
+            pass
+        return entry
+
+    def circuit_open(self):
+        return time.time() < self._open_until
+
+    def _fetch(self, key, args, kwargs):
+        with self._lock:
+            key_lock = self._key_locks[key]
+        with key_lock:
+            return self._fetch_locked(key, args, kwargs)
+
+    def _fetch_locked(self, key, args, kwargs):
+        if self.circuit_open():
+            raise CircuitOpenError(f"{self.fn.__qualname__} is unavailable: {self._last_error}")
+        try:
+            value = self.fn(*args, **kwargs)
+        except self.passthrough:
+            raise
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self._last_error = e
+                if self._failures >= self.failure_threshold:
+                    self._open_until = time.time() + self.cooldown
+            raise
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0
+            self._last_error = None
+        return self._store(key, value)
+
+    def _refresh_in_background(self, key, args, kwargs):
+        with self._lock:
+            if key in self._refreshing or self.circuit_open():
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch(key, args, kwargs)
+            except Exception:
+                # Recorded by the circuit breaker; the stale entry stays in place
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"refresh-{self.fn.__qualname__}", daemon=True).start()
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        entry = self._load(key)
+        if entry is None:
+            # Nothing to serve yet, so the first caller waits for the fetch;
+            # callers arriving meanwhile wait for the same fetch
+            with self._lock:
+                key_lock = self._key_locks[key]
+            with key_lock:
+                entry = self._load(key) or self._fetch_locked(key, args, kwargs)
+        elif time.time() - entry[0] > self.ttl:
+            self._refresh_in_background(key, args, kwargs)
+        return entry[1]
+
+    def refresh(self, *args, **kwargs):
+        # Fetch now regardless of age, e.g. from a scheduler
+        return self._fetch(self._key(args, kwargs), args, kwargs)[1]
+
+    def info(self, *args, **kwargs):
+        entry = self._load(self._key(args, kwargs))
+        return CacheInfo(
+            None if entry is None else entry[0],
+            self.ttl,
+            self.circuit_open(),
+            self._last_error,
+        )
+
+
+def persistent_cache(ttl=3600, failure_threshold=3, cooldown=300, passthrough=()):
+    """Decorator caching a fetcher's results on disk, keyed by its arguments.
+
+    `ttl` is how long (seconds) a result counts as fresh. After
+    `failure_threshold` consecutive failures, fetching pauses for `cooldown`
+    seconds. Exceptions of the `passthrough` types are raised to the caller
+    without counting as failures.
+    """
+    def decorator(fn):
+        name = _cache_name(fn)
+        with _registry_lock:
+            cache = _registry.get(name)
+            if cache is None:
+                cache = _registry[name] = PersistentCache(fn, ttl, failure_threshold, cooldown, passthrough)
+            else:
+                # Rerun of the defining script: keep the cached state, use the new code
+                cache.fn, cache.ttl = fn, ttl
+                cache.failure_threshold, cache.cooldown = failure_threshold, cooldown
+                cache.passthrough = passthrough
+        functools.update_wrapper(cache, fn)
+        return cache
+    return decorator
+
+
+def describe_age(seconds):
+    # Short human-readable age for captions, e.g. "5 min" or "3 h"
+    if seconds < 90:
+        return f"{seconds:.0f} s"
+    if seconds < 90 * 60:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 36 * 3600:
+        return f"{seconds / 3600:.0f} h"
+    return f"{seconds / 86400:.0f} days"
+
+
+def staleness_note(info):
+    # Caption for a result served past its TTL, or None when it is fresh
+    if info.age is None or not (info.stale or info.circuit_open):
+        return None
+    if info.circuit_open:
+        return f"Source unavailable, showing data from {describe_age(info.age)} ago."
+    return f"Showing data from {describe_age(info.age)} ago while it refreshes in the background."
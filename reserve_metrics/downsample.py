@@ -0,0 +1,104 @@
+"""Downsampling of long time series before they are charted.
+
+Charts only need about one point per horizontal pixel, so each series is
+reduced to at most `max_points` points over the visible range:
+
+- "lttb" (Largest-Triangle-Three-Buckets) keeps the points that preserve
+  the shape of the line, including isolated spikes.
+- "minmax" keeps the lowest and highest point of every bucket, so no
+  excursion is ever dropped.
+"""
+import numpy as np
+import pandas as pd
+
+METHODS = ("lttb", "minmax")
+
+
+def _as_float(x):
+    values = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Seconds since the first point, for naive and tz-aware times alike
+        return (values - values.min()).dt.total_seconds().to_numpy()
+    return values.to_numpy(dtype=float)
+
+
+def lttb_indices(x, y, max_points):
+    """Indices of the points LTTB keeps out of the x-sorted series (x, y)."""
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest is split into buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    kept = np.empty(max_points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Point forming the largest triangle with the previous kept point
+        # and the next bucket's average
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax_indices(x, y, max_points):
+    """Indices of the minimum and maximum of each bucket, in x order."""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    buckets = max(max_points // 2, 1)
+    # Bucket number of every point; the extremes of each bucket are kept
+    bucket_of = (np.arange(n) * buckets) // n
+    order = np.lexsort((y, bucket_of))
+    starts = np.searchsorted(bucket_of[order], np.arange(buckets))
+    ends = np.append(starts[1:], n)
+    kept = np.concatenate([order[starts], order[ends - 1], [0, n - 1]])
+    return np.unique(kept)
+
+
+def _indices(x, y, max_points, method):
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    if method == "minmax":
+        return minmax_indices(x, y, max_points)
+    raise ValueError(f"Unknown downsampling method {method!r}, expected one of {METHODS}")
+
+
+def downsample(df, x, y, max_points=800, by=None, method="lttb", start=None, end=None, shared=False):
+    """Rows of `df` to chart, at most about `max_points` per series.
+
+    `by` names the column telling series apart, `start`/`end` limit the
+    visible range of `x`. With `shared`, the x values are picked once from
+    the per-x sum of `y` over all series and every series keeps the same x
+    values, as stacked charts need. Rows with a missing `y` are dropped.
+    """
+    if start is not None:
+        df = df[df[x] >= start]
+    if end is not None:
+        df = df[df[x] <= end]
+    df = df.dropna(subset=[y]).sort_values(x, kind='stable')
+
+    if shared and by is not None:
+        totals = df.groupby(x, sort=True)[y].sum()
+        kept = totals.index[_indices(totals.index, totals.to_numpy(), max_points, method)]
+        return df[df[x].isin(kept)]
+
+    if by is None:
+        return df.iloc[_indices(df[x], df[y], max_points, method)]
+    parts = [
+        series.iloc[_indices(series[x], series[y], max_points, method)]
+        for _, series in df.groupby(by, sort=False)
+    ]
+    return pd.concat(parts) if parts else df
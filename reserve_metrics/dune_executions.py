@@ -0,0 +1,127 @@
+"""Dune query results without waiting on query executions.
+
+`latest_result` serves the query's latest stored result, which costs no
+execution credits. Once that result is older than `max_age`, a new
+execution is submitted and polled in a background thread while the old
+result keeps being served; its `on_refresh` callback runs when the fresh
+result is available. Identical (query, parameters) executions are shared by
+every caller in the process.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+MAX_AGE = int(os.environ.get("DUNE_MAX_AGE", 3600))
+POLL_INTERVAL = float(os.environ.get("DUNE_POLL_INTERVAL", 5))
+EXECUTION_TIMEOUT = int(os.environ.get("DUNE_EXECUTION_TIMEOUT", 900))
+
+# Large enough that get_latest_result never re-executes the query inline
+NEVER_REEXECUTE_HOURS = 10 ** 6
+
+# ExecutionState values, so importing this module doesn't load dune_client
+FINISHED_STATES = {"QUERY_STATE_COMPLETED", "QUERY_STATE_COMPLETED_PARTIAL"}
+FAILED_STATES = {"QUERY_STATE_FAILED", "QUERY_STATE_CANCELLED", "QUERY_STATE_EXPIRED"}
+
+_executions = {}
+_lock = threading.Lock()
+
+
+class ResultPending(Exception):
+    # The query has no stored result yet; one is being executed
+    pass
+
+
+def _result_frame(results):
+    result = results.result
+    columns = result.metadata.column_names if result.metadata else None
+    return pd.DataFrame(result.rows, columns=columns)
+
+
+def _age(results):
+    ended = results.times.execution_ended_at
+    if ended is None:
+        return None
+    return (datetime.now(timezone.utc) - ended).total_seconds()
+
+
+def _poll(client, query, execution_id, on_refresh):
+    key = query.url()
+    try:
+        deadline = time.time() + EXECUTION_TIMEOUT
+        while time.time() < deadline:
+            state = client.get_execution_status(execution_id).state
+            if state.value in FINISHED_STATES:
+                if on_refresh is not None:
+                    on_refresh()
+                return
+            if state.value in FAILED_STATES:
+                log.warning("Dune execution %s of %s ended as %s", execution_id, key, state.value)
+                return
+            time.sleep(POLL_INTERVAL)
+        log.warning("Dune execution %s of %s still running after %ss", execution_id, key, EXECUTION_TIMEOUT)
+    except Exception:
+        log.exception("Polling Dune execution %s of %s failed", execution_id, key)
+    finally:
+        with _lock:
+            _executions.pop(key, None)
+
+
+def submit(client, query, on_refresh=None):
+    """Start executing `query` unless the same execution is already running.
+
+    Returns the execution id, shared with any execution already in flight.
+    """
+    key = query.url()
+    with _lock:
+        running = _executions.get(key)
+        if running is not None:
+            return running
+        # Reserve the key before the request so concurrent callers don't submit too
+        _executions[key] = None
+    try:
+        execution_id = client.execute_query(query).execution_id
+    except BaseException:
+        with _lock:
+            _executions.pop(key, None)
+        raise
+    with _lock:
+        _executions[key] = execution_id
+    threading.Thread(
+        target=_poll, args=(client, query, execution_id, on_refresh),
+        name=f"dune-{query.query_id}", daemon=True,
+    ).start()
+    return execution_id
+
+
+def is_running(query):
+    with _lock:
+        return query.url() in _executions
+
+
+def latest_result(client, query, max_age=MAX_AGE, on_refresh=None):
+    """Latest stored result of `query` as a DataFrame, without blocking on execution.
+
+    A result older than `max_age` seconds is still returned, after a
+    background execution has been submitted. When no result exists yet the
+    execution is submitted and ResultPending is raised.
+    """
+    try:
+        results = client.get_latest_result(query, max_age_hours=NEVER_REEXECUTE_HOURS)
+    except Exception as e:
+        log.info("No stored Dune result for %s: %s", query.url(), e)
+        results = None
+
+    if results is None or results.state.value not in FINISHED_STATES or results.result is None:
+        submit(client, query, on_refresh)
+        raise ResultPending(f"Dune query {query.query_id} is running; results will appear shortly.")
+
+    age = _age(results)
+    if age is None or age > max_age:
+        submit(client, query, on_refresh)
+    return _result_frame(results)
@@ -0,0 +1,72 @@
+"""Dune Analytics queries behind the eUSD peg and FinTech AUM pages."""
+import os
+
+from reserve_metrics import peg_rollups, peg_store
+from reserve_metrics.disk_cache import persistent_cache
+from reserve_metrics.dune_executions import ResultPending, latest_result
+
+PEG_QUERY_ID = 3950965
+PEG_TIMEPERIOD = "day"
+FINTECH_AUM_QUERY_ID = 4019395
+
+# Date parameter of the peg query limiting it to hours at or after it
+PEG_SINCE_PARAMETER = "since"
+
+
+def dune_client():
+    # Streamlit exports root-level secrets such as DUNE_API_KEY to the environment.
+    # dune_client is imported here, so pages stopping without a key never load it
+    from dune_client.client import DuneClient
+
+    return DuneClient(os.environ["DUNE_API_KEY"])
+
+
+def has_api_key():
+    return bool(os.environ.get("DUNE_API_KEY"))
+
+
+def peg_query(query_id, timeperiod, since=None):
+    from dune_client.query import QueryBase
+    from dune_client.types import QueryParameter
+
+    params = [QueryParameter.text_type(name="timeperiod", value=timeperiod)]
+    if since is not None:
+        params.append(QueryParameter.date_type(name=PEG_SINCE_PARAMETER, value=since))
+    return QueryBase(query_id=query_id, params=params)
+
+
+def sync_peg_prices(query_id, timeperiod, on_refresh=None):
+    """Add hours newer than the local peg store from Dune; returns the rows added.
+
+    Only the day of the newest stored hour onwards is requested. The start is
+    truncated to the day so every sync of one day shares a single Dune
+    result, and the last partial hours are refreshed.
+    """
+    last = peg_store.last_hour()
+    since = None if last is None else last.floor('D').to_pydatetime()
+    try:
+        df = latest_result(dune_client(), peg_query(query_id, timeperiod, since), on_refresh=on_refresh)
+    except ResultPending:
+        if last is None:
+            raise
+        # Today's range is executing in the background; keep what is stored
+        if peg_rollups.is_empty():
+            peg_rollups.update()
+        return 0
+    added = peg_store.ingest(df)
+    peg_rollups.update(None if peg_rollups.is_empty() else since)
+    return added
+
+
+@persistent_cache(ttl=3600, passthrough=(ResultPending,))
+def fetch_peg_prices(query_id, timeperiod):
+    # Sync the store, then hand out the stored history in long format. When
+    # the Dune result is too old a fresh execution runs in the background and
+    # refreshes this cache once it completes
+    sync_peg_prices(query_id, timeperiod, on_refresh=lambda: fetch_peg_prices.refresh(query_id, timeperiod))
+    return peg_store.read_prices()
+
+
+@persistent_cache(ttl=3600)
+def fetch_fintech_balances(query_id):
+    return dune_client().get_latest_result_dataframe(query_id)
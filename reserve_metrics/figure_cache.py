@@ -0,0 +1,134 @@
+"""Figures and styled tables cached by the version of the data they're drawn from.
+
+`st.cache_data` finds a cached result by hashing every argument, so a chart
+of a large frame pays for hashing the whole frame on every rerun. Functions
+decorated with `version_cache` are called with a `version` token instead,
+such as the version of the snapshot the frame came from; DataFrame and
+Series arguments are left out of the key, so a lookup costs a dictionary
+access whatever the size of the data.
+
+Each cache counts its hits and misses and the time spent building figures;
+see `stats`. With FIGURE_CACHE_MEASURE_HASHING=1 it also measures how long
+hashing the frame arguments takes on each miss, which is what every hit
+saves compared with `st.cache_data`. That measurement hashes the frames,
+the very cost the cache avoids, so it is off by default.
+
+Cached figures are shared between sessions and must be treated as
+read-only.
+"""
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from reserve_metrics.disk_cache import _cache_name
+
+MEASURE_HASHING = os.environ.get("FIGURE_CACHE_MEASURE_HASHING", "") == "1"
+
+# Caches survive Streamlit reruns, which re-execute the decorators
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _is_frame(value):
+    return isinstance(value, (pd.DataFrame, pd.Series))
+
+
+def _hash_seconds(values):
+    # Time st.cache_data would spend hashing the frames among `values`
+    start = time.perf_counter()
+    for value in values:
+        if _is_frame(value):
+            pd.util.hash_pandas_object(value, index=True).sum()
+    return time.perf_counter() - start
+
+
+class VersionCache:
+
+    def __init__(self, fn, max_entries):
+        self.fn = fn
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+        self.hash_seconds_saved = 0.0
+        # Hashing time of the latest miss per key, credited on each hit
+        self._hash_cost = {}
+
+    def _key(self, version, args, kwargs):
+        return (
+            version,
+            tuple(None if _is_frame(arg) else arg for arg in args),
+            tuple(sorted((name, None if _is_frame(value) else value) for name, value in kwargs.items())),
+        )
+
+    def __call__(self, *args, version, **kwargs):
+        key = self._key(version, args, kwargs)
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                self.hash_seconds_saved += self._hash_cost.get(key, 0.0)
+                return self._figures[key]
+
+        start = time.perf_counter()
+        figure = self.fn(*args, **kwargs)
+        built = time.perf_counter() - start
+        hashed = _hash_seconds(list(args) + list(kwargs.values())) if MEASURE_HASHING else 0.0
+
+        with self._lock:
+            self.misses += 1
+            self.build_seconds += built
+            self._figures[key] = figure
+            self._hash_cost[key] = hashed
+            while len(self._figures) > self.max_entries:
+                evicted, _ = self._figures.popitem(last=False)
+                self._hash_cost.pop(evicted, None)
+        return figure
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'build_seconds': self.build_seconds,
+            # Unknown unless hashing is measured
+            'hash_seconds_saved': self.hash_seconds_saved if MEASURE_HASHING else None,
+        }
+
+
+def version_cache(max_entries=32):
+    """Decorator caching a figure builder's results by a `version` token.
+
+    Call the decorated function with `version=` set to a token that changes
+    whenever its DataFrame arguments do. Other arguments are part of the
+    key as usual. The `max_entries` most recently used figures are kept.
+    """
+    def decorator(fn):
+        name = _cache_name(fn)
+        with _registry_lock:
+            cache = _registry.get(name)
+            if cache is None:
+                cache = _registry[name] = VersionCache(fn, max_entries)
+            else:
+                # Rerun of the defining script: keep the cached figures, use the new code
+                cache.fn, cache.max_entries = fn, max_entries
+        functools.update_wrapper(cache, fn)
+        return cache
+    return decorator
+
+
+def stats():
+    # Hit rate and time saved of every figure cache, one row per cache
+    with _registry_lock:
+        caches = dict(_registry)
+    return pd.DataFrame.from_dict(
+        {name: cache.stats() for name, cache in caches.items()},
+        orient='index', columns=['hits', 'misses', 'hit_rate', 'build_seconds', 'hash_seconds_saved'],
+    )
@@ -0,0 +1,79 @@
+"""FinTech companies holding eUSD and the processing of their balances.
+
+The Dune query returns one row per date with a balance column per company
+and chain; COMPANIES maps those columns, so adding a company or a chain is
+one entry here.
+"""
+from collections import namedtuple
+
+import pandas as pd
+
+# `balances` maps each chain to the Dune column holding the company's balance
+# there, `color` is the company's color in the charts
+Company = namedtuple("Company", ["name", "color", "balances"])
+
+COMPANIES = [
+    Company("Ugly Cash", "#ff8452", {'Base': 'ugly_cash_base_balance', 'Ethereum': 'ugly_cash_eth_balance'}),
+    Company("Sentz", "#6d38ff", {'Base': 'sentz_base_balance', 'Ethereum': 'sentz_eth_balance'}),
+]
+
+COMPANY_NAMES = [company.name for company in COMPANIES]
+
+TOTAL = "Total AUM"
+
+# Comparison window label -> days
+WINDOWS = {'7d': 7, '30d': 30, '90d': 90}
+
+
+def process_balances(df, companies=COMPANIES):
+    """Balances indexed by date in ascending order.
+
+    Holds every configured balance column as numbers (missing or unparsable
+    balances count as 0), one total column per company and TOTAL.
+    """
+    balances = pd.DataFrame(index=pd.to_datetime(df['date']))
+    for company in companies:
+        for column in company.balances.values():
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce').to_numpy()
+            else:
+                values = 0.0
+            balances[column] = values
+    balances = balances.fillna(0.0).sort_index(kind='stable')
+    for company in companies:
+        balances[company.name] = balances[list(company.balances.values())].sum(axis=1)
+    balances[TOTAL] = balances[[company.name for company in companies]].sum(axis=1)
+    return balances
+
+
+def as_of(balances, date):
+    # Row of the latest date at or before `date`, or None when there is none;
+    # the index is sorted, so this is a binary search
+    position = balances.index.searchsorted(date, side='right') - 1
+    if position < 0:
+        return None
+    return balances.iloc[position]
+
+
+def changes(balances, days, columns=None):
+    """Latest value of `columns` (default every company and TOTAL) and its
+    change over the last `days` days.
+
+    Returns a frame indexed by column with `current` and `change`; `change`
+    is NaN when the data doesn't go back that far.
+    """
+    columns = COMPANY_NAMES + [TOTAL] if columns is None else columns
+    latest = balances.iloc[-1][columns]
+    before = as_of(balances, balances.index[-1] - pd.Timedelta(days=days))
+    change = latest - before[columns] if before is not None else pd.Series(float('nan'), index=columns)
+    return pd.DataFrame({'current': latest, 'change': change})
+
+
+def chart_data(balances, names):
+    # Long frame of date, company and balance for the companies in `names`
+    return (
+        balances[names]
+        .rename_axis('date')
+        .reset_index()
+        .melt(id_vars='date', var_name='company', value_name='balance')
+    )
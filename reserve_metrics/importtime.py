@@ -0,0 +1,127 @@
+"""Cold import time of each dashboard page, as `python -X importtime` reports it.
+
+Every page's top-level imports run in a fresh interpreter after Streamlit
+and pandas: the server has always loaded Streamlit already, and every data
+page needs pandas, so neither is down to any one page. What the page's
+imports add on top is its import time. Imports inside functions are lazy
+and not counted. Any other import after the page's first statement that
+isn't an import would run on every page load without being measured, so
+such imports belong at the top or in a function.
+
+    $ python -m reserve_metrics.importtime            # report
+    $ python -m reserve_metrics.importtime --check    # exit 1 over budget
+
+--check runs each page a few times and compares the fastest run with its
+budget in BUDGETS_MS (DEFAULT_BUDGET_MS for pages not listed), and fails
+pages with imports it can't measure.
+"""
+import argparse
+import ast
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAGES = [ROOT / "streamlit_app.py"] + sorted((ROOT / "pages").glob("*.py"))
+
+DEFAULT_BUDGET_MS = 100
+BUDGETS_MS = {
+    # The Morpho query documents, parsed with gql when the fetchers load
+    "1_Lending_Market_Metrics.py": 250,
+    # Pages charting with plotly from their first line
+    "2_RToken_Price_Depth.py": 250,
+    "6_DTF_Market_Maps.py": 250,
+}
+
+# Loaded before any page's own imports run
+BASELINE = "import streamlit\nimport pandas"
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def page_imports(path):
+    # Source of the imports at the top of a page, up to its first other statement
+    tree = ast.parse(path.read_text(), str(path))
+    imports = []
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        imports.append(ast.get_source_segment(path.read_text(), node))
+    return "\n".join(imports)
+
+
+def late_imports(path):
+    """Line numbers of imports outside functions after the page's first
+    statement that isn't an import."""
+    tree = ast.parse(path.read_text(), str(path))
+    prefix = 0
+    while prefix < len(tree.body) and isinstance(tree.body[prefix], (ast.Import, ast.ImportFrom)):
+        prefix += 1
+
+    lines = []
+    def visit(node):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(node.lineno)
+        elif not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            for child in ast.iter_child_nodes(node):
+                visit(child)
+    for node in tree.body[prefix:]:
+        visit(node)
+    return lines
+
+
+def measure(path):
+    """Modules a page imports on top of the baseline, heaviest first.
+
+    Returns (total microseconds, [(module, cumulative microseconds)]) for
+    the modules imported directly, not through another one.
+    """
+    code = f"{BASELINE}\nimport sys\nprint('---', file=sys.stderr)\n{page_imports(path)}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    stderr = result.stderr.split("---\n", 1)[1]
+    modules = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match and not match.group(3):
+            modules.append((match.group(4), int(match.group(2))))
+    modules.sort(key=lambda module: -module[1])
+    return sum(cumulative for _, cumulative in modules), modules
+
+
+def budget_ms(path):
+    return BUDGETS_MS.get(path.name, DEFAULT_BUDGET_MS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reserve_metrics.importtime", description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if a page is over its budget")
+    parser.add_argument("--runs", type=int, default=3, help="runs per page; the fastest counts (default 3)")
+    parser.add_argument("--top", type=int, default=5, help="heaviest modules listed per page (default 5)")
+    args = parser.parse_args(argv)
+
+    over = []
+    for path in PAGES:
+        total, modules = min((measure(path) for _ in range(args.runs)), key=lambda run: run[0])
+        budget = budget_ms(path)
+        late = late_imports(path)
+        status = "over budget" if total / 1000 > budget else "ok"
+        if late:
+            status = f"imports outside functions on line(s) {', '.join(map(str, late))} not measured"
+        print(f"{path.name}: {total / 1000:.0f} ms (budget {budget} ms, {status})")
+        for module, cumulative in modules[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {module}")
+        if status != "ok":
+            over.append(path.name)
+    if args.check and over:
+        print(f"Over the import time budget or not fully measured: {', '.join(over)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""Data behind the Lending Market Metrics page: Morpho queries, processing
+and the cached fetchers the page and the refresh scheduler read from.
+"""
+import numpy as np
+import pandas as pd
+
+from reserve_metrics.disk_cache import persistent_cache
+from reserve_metrics.liquidation_store import read_liquidations, sync_liquidations
+from reserve_metrics.market_history import record_snapshot
+from reserve_metrics.markets import (
+    COLLATERAL_DECIMALS, LIQUIDATION_MARKET_KEYS, LOAN_PRICE_REFERENCE, MARKET_KEYS, VAULTS, market_name,
+)
+from reserve_metrics.morpho_batch import BatchPart, compile_batch, execute_batch, select
+
+def graphql_list(values):
+    return "[" + " ".join(f'"{value}"' for value in values) + "]"
+
+# Fields each processor reads; queries select exactly these (see select)
+MARKET_FIELDS = [
+    'uniqueKey',
+    'collateralPrice',
+    'reallocatableLiquidityAssets',
+    'loanAsset.decimals',
+    'collateralAsset.decimals',
+    'state.collateralAssets',
+    'state.collateralAssetsUsd',
+    'state.supplyAssetsUsd',
+    'state.borrowAssetsUsd',
+    'state.liquidityAssetsUsd',
+    'state.utilization',
+    'state.netSupplyApy',
+    'state.netBorrowApy',
+]
+
+# Everything else the markets query used to download, only fetched for the
+# raw data view
+MARKET_RAW_FIELDS = MARKET_FIELDS + [
+    'id', 'lltv', 'oracleAddress', 'irmAddress', 'creationBlockNumber', 'creationTimestamp',
+    'creatorAddress', 'whitelisted', 'targetBorrowUtilization', 'targetWithdrawUtilization',
+    'loanAsset.address', 'loanAsset.symbol',
+    'collateralAsset.address', 'collateralAsset.symbol',
+    'oracle.address', 'oracle.type',
+    'state.borrowAssets', 'state.supplyAssets', 'state.borrowShares', 'state.supplyShares',
+    'state.liquidityAssets', 'state.rateAtUTarget', 'state.supplyApy', 'state.borrowApy',
+    'state.fee', 'state.timestamp',
+    'concentration.supplyHhi', 'concentration.borrowHhi',
+    'badDebt.underlying', 'badDebt.usd',
+    'realizedBadDebt.underlying', 'realizedBadDebt.usd',
+    'dailyApys.supplyApy', 'dailyApys.borrowApy', 'dailyApys.netSupplyApy', 'dailyApys.netBorrowApy',
+    'warnings.type', 'warnings.level',
+]
+
+POSITION_FIELDS = [
+    'supplyAssetsUsd',
+    'borrowAssetsUsd',
+    'collateral',
+    'collateralUsd',
+    'market.uniqueKey',
+    'market.collateralAsset.symbol',
+    'user.address',
+]
+
+VAULT_POSITION_FIELDS = ['assetsUsd']
+
+def markets_part(fields=MARKET_FIELDS):
+    return BatchPart(
+        'markets', 'markets',
+        arguments=f"first: 100, where: {{ uniqueKey_in: {graphql_list(MARKET_KEYS)} }}",
+        selection=f"items {select(fields)}",
+    )
+
+# Queries of the market data source, composed into one batched document by fetch_market_sources
+MARKETS_PART = markets_part()
+
+POSITIONS_PART = BatchPart(
+    'positions', 'marketPositions',
+    arguments=f"orderBy: SupplyShares, orderDirection: Desc, where: {{ marketUniqueKey_in: {graphql_list(MARKET_KEYS)} }}",
+    paginate=True,
+    selection=f"items {select(POSITION_FIELDS)}",
+)
+
+def vault_positions_part(alias, vault):
+    return BatchPart(
+        alias, 'vaultPositions',
+        arguments=f'orderBy: Shares, orderDirection: Desc, where: {{ vaultAddress_in: ["{vault.address}"] }}',
+        paginate=True,
+        selection=f"items {select(VAULT_POSITION_FIELDS)}",
+    )
+
+MAINNET_VAULT_PART = vault_positions_part('mainnetVault', VAULTS['mainnet'])
+BASE_VAULT_PART = vault_positions_part('baseVault', VAULTS['base'])
+
+MARKET_SOURCE_PARTS = [MARKETS_PART, POSITIONS_PART, MAINNET_VAULT_PART, BASE_VAULT_PART]
+MARKET_SOURCES_DOCUMENT = compile_batch(MARKET_SOURCE_PARTS)
+
+def count_vault_suppliers(pages):
+    # Suppliers with more than $5 in the vault, and their total supply
+    suppliers = 0
+    vaultsupply = 0
+    for items in pages:
+        for item in items:
+            if float(item['assetsUsd']) > 5:
+                suppliers += 1
+                vaultsupply += float(item['assetsUsd'])
+    return suppliers, vaultsupply
+
+def scale_amounts(raw, decimals):
+    # Raw integer amounts (strings or ints, often beyond 2**64) divided by
+    # 10**decimals per row. The whole and fractional digits of each amount are
+    # converted separately, so large amounts are not rounded before scaling
+    digits = raw.astype(str)
+    decimals = pd.Series(decimals, index=raw.index).astype(int)
+    scaled = pd.to_numeric(raw, errors='coerce') / 10.0 ** decimals
+    for d in decimals[decimals > 0].unique():
+        rows = (decimals == d) & digits.str.fullmatch(r"\d+")
+        padded = digits[rows].str.zfill(d + 1)
+        scaled[rows] = padded.str[:-d].astype(float) + padded.str[-d:].astype(float) / 10.0 ** d
+    return scaled
+
+def process_liquidation_data(df):
+    # Rows come from the liquidation store already in block order, with
+    # running totals maintained as they were appended
+    df = df.copy()
+    df['market'] = df['market'].map(market_name)
+    return df[['blockNumber', 'type', 'user', 'market', 'seizedAssetsUsd', 'hash', 'liquidations_total']]
+
+def process_market_data(response):
+    # One row per market, indexed by its unique key
+    markets = pd.json_normalize(response['markets']['items']).set_index('uniqueKey')
+    loan_decimals = markets['loanAsset.decimals'].astype(int)
+    collateral_decimals = markets['collateralAsset.decimals'].astype(int)
+
+    # Oracle prices are the collateral price in loan asset units, scaled by
+    # 10**(36 + loan decimals - collateral decimals)
+    collateral_price = scale_amounts(markets['collateralPrice'], 36 + loan_decimals - collateral_decimals)
+    collateral_assets = scale_amounts(markets['state.collateralAssets'], collateral_decimals)
+    reallocatable_liquidity = scale_amounts(markets['reallocatableLiquidityAssets'], loan_decimals)
+
+    # USD price of the loan asset: 1 for eUSD, otherwise read from the
+    # collateral price of the reference market
+    reference = pd.Series(LOAN_PRICE_REFERENCE).reindex(markets.index)
+    loan_price = reference.map(collateral_price).where(reference.notna(), 1.0)
+
+    reallocatable_liquidity = reallocatable_liquidity * loan_price
+    collateral_usd = pd.to_numeric(markets['state.collateralAssetsUsd']).fillna(collateral_price * collateral_assets * loan_price)
+
+    df = pd.DataFrame({
+        'Collateral USD': np.trunc(collateral_usd),
+        'Total Supply': np.trunc(markets['state.supplyAssetsUsd'].astype(float)),
+        'Total Borrowed': np.trunc(markets['state.borrowAssetsUsd'].astype(float)),
+        'Available Liquidity': markets['state.liquidityAssetsUsd'].astype(float) + reallocatable_liquidity,
+        'Utilization': markets['state.utilization'].astype(float),
+        'Net Supply APY': markets['state.netSupplyApy'].astype(float),
+        'Net Borrow APY': markets['state.netBorrowApy'].astype(float),
+        "Reallocatable Liq": reallocatable_liquidity,
+        "Direct Liq": np.trunc(markets['state.liquidityAssetsUsd'].astype(float)),
+    })
+    df.index = [market_name(key) for key in markets.index]
+
+    return df.round(4)
+
+POSITION_COLUMNS = [
+    "Total Supply", "Total Borrowed", "Available Liquidity", "Utilization",
+    "Current Borrowers", "Total Collateral", "Total Collateral USD", "Collateral Asset",
+]
+
+# Positions are aggregated a chunk at a time as pages arrive, so memory stays
+# bounded by CHUNK_SIZE whatever the number of positions. Chunks are
+# aggregated column-wise, except that fewer than LOOP_THRESHOLD positions
+# (today's whole response is about 1,000) go through the per-position loop:
+# below that, building the columns costs more than it saves
+CHUNK_SIZE = 50_000
+LOOP_THRESHOLD = 10_000
+
+def _market_totals():
+    return {'supply_usd': 0.0, 'borrow_usd': 0.0, 'collateral': 0.0, 'collateral_usd': 0.0, 'borrowers': set(), 'symbol': ""}
+
+def _add_positions_loop(totals, items):
+    for item in items:
+        key = item['market']['uniqueKey']
+        market = totals.get(key)
+        if market is None:
+            market = totals[key] = _market_totals()
+        market['supply_usd'] += float(item['supplyAssetsUsd'])
+        market['borrow_usd'] += float(item['borrowAssetsUsd'])
+        market['collateral'] += float(item['collateral']) / 10.0 ** COLLATERAL_DECIMALS.get(key, 18)
+        market['collateral_usd'] += float(item['collateralUsd'] or 0)
+        if float(item['borrowAssetsUsd']) > 5:
+            market['borrowers'].add(item['user']['address'])
+        if not market['symbol']:
+            market['symbol'] = item['market']['collateralAsset']['symbol']
+
+def _add_positions_columnar(totals, items):
+    # Flattened once into the columns needed, then summed per market.
+    # json_normalize is avoided: its generic flattening of nested items costs
+    # more than the per-position loop it would replace
+    markets = [item['market'] for item in items]
+    # Integer codes, with markets numbered in the order they first appear
+    market_codes, market_keys = pd.factorize(pd.Series([market['uniqueKey'] for market in markets]))
+    collateral_decimals = pd.Series(market_keys).map(COLLATERAL_DECIMALS).fillna(18).to_numpy()[market_codes]
+    users = np.array([item['user']['address'] for item in items], dtype=object)
+    df = pd.DataFrame({
+        'market': market_codes,
+        'supplyAssetsUsd': np.array([item['supplyAssetsUsd'] for item in items], dtype=float),
+        'borrowAssetsUsd': np.array([item['borrowAssetsUsd'] for item in items], dtype=float),
+        # Scaled by each market's collateral decimals from the registry
+        'collateral': np.array([item['collateral'] for item in items], dtype=float) / 10.0 ** collateral_decimals,
+        # None (no USD price) becomes NaN, counted as 0
+        'collateralUsd': np.array([item['collateralUsd'] for item in items], dtype=float),
+    })
+    sums = df.groupby('market').sum(min_count=0)
+    borrowing = df['borrowAssetsUsd'].to_numpy() > 5
+
+    for code, key in enumerate(market_keys):
+        market = totals.get(key)
+        if market is None:
+            market = totals[key] = _market_totals()
+        market['supply_usd'] += sums.at[code, 'supplyAssetsUsd']
+        market['borrow_usd'] += sums.at[code, 'borrowAssetsUsd']
+        market['collateral'] += sums.at[code, 'collateral']
+        market['collateral_usd'] += sums.at[code, 'collateralUsd']
+        rows = market_codes == code
+        market['borrowers'].update(users[rows & borrowing])
+        if not market['symbol']:
+            # First non-empty collateral symbol; usually the first position's
+            symbols = (markets[row]['collateralAsset']['symbol'] for row in np.flatnonzero(rows))
+            market['symbol'] = next((symbol for symbol in symbols if symbol), "")
+
+def _add_positions(totals, items):
+    if len(items) < LOOP_THRESHOLD:
+        _add_positions_loop(totals, items)
+    else:
+        _add_positions_columnar(totals, items)
+
+def process_market_positions(pages):
+    # Running totals per market key, in the order markets first appear
+    totals = {}
+    chunk = []
+    for items in pages:
+        chunk.extend(items)
+        if len(chunk) >= CHUNK_SIZE:
+            _add_positions(totals, chunk)
+            chunk = []
+    _add_positions(totals, chunk)
+
+    if not totals:
+        return pd.DataFrame(columns=POSITION_COLUMNS)
+    supply = pd.Series([market['supply_usd'] for market in totals.values()], dtype=float)
+    borrow = pd.Series([market['borrow_usd'] for market in totals.values()], dtype=float)
+    result = pd.DataFrame({
+        "Total Supply": supply,
+        "Total Borrowed": borrow,
+        "Available Liquidity": supply - borrow,
+        "Utilization": (borrow / supply).where(supply != 0, 0),
+        "Current Borrowers": [len(market['borrowers']) for market in totals.values()],
+        "Total Collateral": [market['collateral'] for market in totals.values()],
+        "Total Collateral USD": [market['collateral_usd'] for market in totals.values()],
+        "Collateral Asset": [market['symbol'] for market in totals.values()],
+    })
+    result.index = [market_name(key) for key in totals]
+    return result
+
+@persistent_cache(ttl=3600)  # Fresh for 1 hour, then refreshed in the background
+def fetch_market_sources():
+    # Markets, positions and both vaults in one round trip; only positions
+    # beyond the first page need follow-up requests
+    results = execute_batch(MARKET_SOURCE_PARTS, document=MARKET_SOURCES_DOCUMENT)
+
+    df_market = process_market_data(results['markets'])
+    # Positions first: they are the largest list, and the vault pages that
+    # arrive meanwhile from the same concurrent walk are held until read
+    df_market_positions = process_market_positions(results['positions'])
+
+    ethmainnet_suppliers, ethmainnet_vaultsupply = count_vault_suppliers(results['mainnetVault'])
+    base_suppliers, base_vaultsupply = count_vault_suppliers(results['baseVault'])
+    suppliers = (ethmainnet_suppliers, base_suppliers, ethmainnet_vaultsupply, base_vaultsupply)
+
+    # Keep the history behind the weekly change chart
+    record_snapshot(df_market, df_market_positions, suppliers)
+
+    return df_market, df_market_positions, suppliers
+
+@persistent_cache(ttl=3600)
+def fetch_raw_markets():
+    # Every market field the API offers, flattened, for the raw data view only
+    results = execute_batch([markets_part(MARKET_RAW_FIELDS)])
+    return pd.json_normalize(results['markets']['markets']['items']).set_index('uniqueKey')
+
+@persistent_cache(ttl=3600)  # Fresh for 1 hour, then refreshed in the background
+def fetch_liquidations():
+    # All-time history, kept apart so a slow liquidation query can't hold up the
+    # markets; only liquidations newer than the local store are downloaded
+    sync_liquidations(LIQUIDATION_MARKET_KEYS)
+    return process_liquidation_data(read_liquidations(LIQUIDATION_MARKET_KEYS))
@@ -0,0 +1,191 @@
+"""Local store of Morpho liquidations, synced incrementally.
+
+Each sync only asks the API for liquidations at or after the newest one
+already stored for the requested markets. The running all-time total per
+market is kept in `liquidation_totals`, so new rows get their
+`liquidations_total` without re-reading the full history.
+"""
+import pandas as pd
+
+from reserve_metrics.morpho_batch import BatchPart, compile_batch, execute_batch
+from reserve_metrics.storage import connect
+
+DB_NAME = "liquidations.sqlite"
+
+LIQUIDATION_SELECTION = """
+    items {
+      blockNumber
+      timestamp
+      hash
+      type
+      user {
+        address
+      }
+      data {
+        ... on MarketLiquidationTransactionData {
+          seizedAssets
+          seizedAssetsUsd
+          market {
+            uniqueKey
+          }
+        }
+      }
+    }
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS liquidations (
+    hash TEXT NOT NULL,
+    market TEXT NOT NULL,
+    user TEXT NOT NULL,
+    seized_assets TEXT NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    seized_assets_usd REAL,
+    liquidations_total REAL,
+    PRIMARY KEY (hash, market, user, seized_assets)
+);
+CREATE INDEX IF NOT EXISTS liquidations_market_block ON liquidations (market, block_number);
+CREATE TABLE IF NOT EXISTS liquidation_totals (
+    market TEXT PRIMARY KEY,
+    total REAL NOT NULL,
+    last_block INTEGER NOT NULL,
+    last_timestamp INTEGER NOT NULL
+);
+"""
+
+
+def _connect():
+    conn = connect(DB_NAME)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _watermark(conn, market_keys):
+    # Oldest of the per-market watermarks, so a newly added market is backfilled
+    placeholders = ",".join("?" * len(market_keys))
+    rows = dict(conn.execute(
+        f"SELECT market, last_timestamp FROM liquidation_totals WHERE market IN ({placeholders})",
+        market_keys,
+    ).fetchall())
+    return min(rows.get(key, 0) for key in market_keys)
+
+
+# Compiled once at import; the markets and the watermark are passed as
+# variables on each sync
+LIQUIDATIONS_PART = BatchPart(
+    'liquidations', 'transactions',
+    arguments=(
+        "orderBy: Timestamp, orderDirection: Asc, "
+        "where: { marketUniqueKey_in: $markets, type_in: [MarketLiquidation], timestamp_gte: $since }"
+    ),
+    paginate=True,
+    selection=LIQUIDATION_SELECTION,
+    variables={'markets': "[String!]", 'since': "Int"},
+)
+LIQUIDATIONS_DOCUMENT = compile_batch([LIQUIDATIONS_PART])
+
+
+def _rows(pages):
+    for items in pages:
+        for item in items:
+            data = item['data']
+            yield {
+                'hash': item['hash'],
+                'market': data['market']['uniqueKey'],
+                'user': item['user']['address'],
+                'seized_assets': str(data['seizedAssets']),
+                'block_number': int(item['blockNumber']),
+                'timestamp': int(item['timestamp']),
+                'type': item['type'],
+                'seized_assets_usd': float(data['seizedAssetsUsd'] or 0),
+            }
+
+
+def sync_liquidations(market_keys):
+    """Fetch liquidations newer than the stored watermark and append them.
+
+    Returns the number of new rows. Rows at the watermark itself are fetched
+    again and dropped by key, so liquidations sharing a timestamp with the
+    last stored one are not lost.
+    """
+    market_keys = list(market_keys)
+    conn = _connect()
+    try:
+        since = _watermark(conn, market_keys)
+        results = execute_batch(
+            [LIQUIDATIONS_PART], document=LIQUIDATIONS_DOCUMENT,
+            variables={'markets': market_keys, 'since': since},
+        )
+        new = pd.DataFrame(list(_rows(results['liquidations'])))
+        if new.empty:
+            return 0
+        seen_timestamp = int(new['timestamp'].max())
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            key_columns = ['hash', 'market', 'user', 'seized_assets']
+            existing = pd.DataFrame(conn.execute(
+                "SELECT hash, market, user, seized_assets FROM liquidations WHERE timestamp >= ?",
+                (int(new['timestamp'].min()),),
+            ).fetchall(), columns=key_columns)
+            new = new.drop_duplicates(key_columns)
+            new = new.merge(existing, on=key_columns, how='left', indicator=True)
+            new = new[new['_merge'] == 'left_only'].drop(columns='_merge')
+
+            if not new.empty:
+                # Continue each market's running total from the stored one
+                totals = dict(conn.execute("SELECT market, total FROM liquidation_totals").fetchall())
+                new = new.sort_values(['block_number', 'timestamp'], kind='stable')
+                base = new['market'].map(totals).fillna(0)
+                new['liquidations_total'] = base + new.groupby('market')['seized_assets_usd'].cumsum()
+
+                columns = list(new.columns)
+                conn.executemany(
+                    f"INSERT INTO liquidations ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    new.astype(object).itertuples(index=False, name=None),
+                )
+                last = new.groupby('market').agg(
+                    total=('liquidations_total', 'last'),
+                    last_block=('block_number', 'max'),
+                    last_timestamp=('timestamp', 'max'),
+                ).reset_index()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO liquidation_totals (market, total, last_block, last_timestamp) VALUES (?, ?, ?, ?)",
+                    [(r.market, float(r.total), int(r.last_block), int(r.last_timestamp)) for r in last.itertuples()],
+                )
+
+            # Everything up to the newest fetched timestamp has now been seen
+            # for every requested market, including markets that were quiet
+            conn.executemany(
+                "INSERT INTO liquidation_totals (market, total, last_block, last_timestamp) VALUES (?, 0, 0, ?) "
+                "ON CONFLICT(market) DO UPDATE SET last_timestamp = MAX(last_timestamp, excluded.last_timestamp)",
+                [(key, seen_timestamp) for key in market_keys],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(new)
+    finally:
+        conn.close()
+
+
+def read_liquidations(market_keys=None):
+    # Stored liquidations in block order, in the columns the Lending page shows
+    conn = _connect()
+    try:
+        query = (
+            "SELECT block_number AS blockNumber, type, user, market, seized_assets_usd AS seizedAssetsUsd, "
+            "hash, liquidations_total FROM liquidations"
+        )
+        params = ()
+        if market_keys is not None:
+            market_keys = list(market_keys)
+            query += f" WHERE market IN ({','.join('?' * len(market_keys))})"
+            params = market_keys
+        query += " ORDER BY block_number, timestamp"
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
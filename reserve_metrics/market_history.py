@@ -0,0 +1,128 @@
+"""Append-only history of Lending market state.
+
+Every refresh of the market sources appends one row per market (and per
+vault) to `market_snapshots`, all sharing the snapshot's `taken_at`. Deltas
+between any two points in time compare the latest snapshot at or before
+each of them.
+"""
+import time
+
+import pandas as pd
+
+from reserve_metrics.markets import VAULTS
+from reserve_metrics.storage import connect
+
+DB_NAME = "market_history.sqlite"
+
+WEEK = 7 * 24 * 3600
+
+# Snapshot column -> (source frame, source column)
+COLUMNS = {
+    'supply_usd': ('market', 'Total Supply'),
+    'borrowed_usd': ('market', 'Total Borrowed'),
+    'available_liquidity': ('market', 'Available Liquidity'),
+    'utilization': ('market', 'Utilization'),
+    'net_supply_apy': ('market', 'Net Supply APY'),
+    'net_borrow_apy': ('market', 'Net Borrow APY'),
+    'collateral_usd': ('market', 'Collateral USD'),
+    'borrowers': ('positions', 'Current Borrowers'),
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS market_snapshots (
+    taken_at INTEGER NOT NULL,
+    market TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in COLUMNS)},
+    PRIMARY KEY (market, taken_at)
+);
+CREATE INDEX IF NOT EXISTS market_snapshots_taken_at ON market_snapshots (taken_at);
+"""
+
+
+def _connect():
+    conn = connect(DB_NAME)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def snapshot_rows(df_market, df_market_positions, suppliers):
+    # One row per market from the processed frames, plus one per vault with
+    # its supplier count in `borrowers` (as the borrowers chart shows it)
+    frames = {'market': df_market, 'positions': df_market_positions}
+    rows = pd.DataFrame({
+        column: frames[frame][source] for column, (frame, source) in COLUMNS.items()
+    })
+    ethmainnet_suppliers, base_suppliers = suppliers[:2]
+    vaults = pd.DataFrame(
+        {'borrowers': [ethmainnet_suppliers, base_suppliers]},
+        index=[VAULTS['mainnet'].label, VAULTS['base'].label],
+    )
+    return pd.concat([rows, vaults]).rename_axis('market').reset_index()
+
+
+def record_snapshot(df_market, df_market_positions, suppliers, taken_at=None):
+    """Append the current state of every market and return its timestamp."""
+    taken_at = int(time.time() if taken_at is None else taken_at)
+    rows = snapshot_rows(df_market, df_market_positions, suppliers)
+    rows.insert(0, 'taken_at', taken_at)
+    rows = rows.astype(object).where(rows.notna(), None)
+
+    conn = _connect()
+    try:
+        columns = list(rows.columns)
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO market_snapshots ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows.itertuples(index=False, name=None),
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return taken_at
+
+
+def snapshot_at(conn, at):
+    # Timestamp of the latest snapshot at or before `at`, or None
+    return conn.execute("SELECT MAX(taken_at) FROM market_snapshots WHERE taken_at <= ?", (int(at),)).fetchone()[0]
+
+
+def read_snapshot(at=None):
+    """State of every market in the latest snapshot at or before `at` (default now).
+
+    Returns a frame indexed by market, with the snapshot time in
+    `df.attrs['taken_at']`, or None when no snapshot is that old.
+    """
+    conn = _connect()
+    try:
+        taken_at = snapshot_at(conn, time.time() if at is None else at)
+        if taken_at is None:
+            return None
+        df = pd.read_sql_query(
+            f"SELECT market, {', '.join(COLUMNS)} FROM market_snapshots WHERE taken_at = ?",
+            conn, params=(taken_at,), index_col='market',
+        )
+    finally:
+        conn.close()
+    df.attrs['taken_at'] = taken_at
+    return df
+
+
+def deltas(start, end=None):
+    """Change of every column per market between two points in time.
+
+    Compares the latest snapshots at or before `start` and `end` (default
+    now). Markets missing from the older snapshot count from zero. Returns
+    None when there is no snapshot at or before `start`.
+    """
+    before = read_snapshot(start)
+    after = read_snapshot(end)
+    if before is None or after is None:
+        return None
+    df = after.sub(before.reindex(after.index), fill_value=0)
+    df.attrs['start'], df.attrs['end'] = before.attrs['taken_at'], after.attrs['taken_at']
+    return df
+
+
+def weekly_change(end=None):
+    end = time.time() if end is None else end
+    return deltas(end - WEEK, end)
@@ -0,0 +1,51 @@
+"""Registry of the Morpho markets and vaults shown on the dashboard.
+
+Queries, processors and the liquidation store all read from here, so adding
+a market is one entry in MARKETS.
+"""
+from collections import namedtuple
+
+# `label` is how charts name the vault next to the markets
+Vault = namedtuple("Vault", ["name", "chain", "address", "label"])
+
+VAULTS = {
+    'mainnet': Vault("Gauntlet eUSD Core", "ethereum", "0xc080f56504e0278828A403269DB945F6c6D6E014", "Gauntlet eUSD Core (ETH)"),
+    'base': Vault("Gauntlet eUSD Core", "base", "0xbb819D845b573B5D7C538F5b85057160cfb5f313", "Gauntlet eUSD Core (Base)"),
+}
+
+# `vault` is the VAULTS entry supplying the market, `price_reference` the key
+# of the eUSD market whose collateral price gives this market's loan asset a
+# USD price (for loan assets other than eUSD), and `liquidations` whether the
+# market's liquidations are tracked
+Market = namedtuple(
+    "Market",
+    ["key", "name", "chain", "collateral", "loan", "collateral_decimals", "loan_decimals",
+     "vault", "price_reference", "liquidations"],
+    defaults=[None, None, True],
+)
+
+MARKETS = [
+    Market("0x3f4d007982a480dd99052c05d811cf6838ce61b2a2be8dc52fca107f783d1f15", "ETH+/eUSD", "ethereum", "ETH+", "eUSD", 18, 18, vault='mainnet'),
+    Market("0x461da96754b33fec844fc5e5718bf24298a2c832d8216c5ffd17a5230548f01f", "WBTC/eUSD", "ethereum", "WBTC", "eUSD", 8, 18, vault='mainnet'),
+    Market("0x6029eea874791e01e2f3ce361f2e08839cd18b1e26eea6243fa3e43fe8f6fa23", "wstETH/eUSD", "ethereum", "wstETH", "eUSD", 18, 18, vault='mainnet'),
+    Market("0xf9ed1dba3b6ba1ede10e2115a9554e9c52091c9f1b1af21f9e0fecc855ee74bf", "bsdETH/eUSD (Base)", "base", "bsdETH", "eUSD", 18, 18, vault='base'),
+    Market("0x3a5bdf0be8d820c1303654b078b14f8fc6d715efaeca56cec150b934bdcbff31", "hyUSD/eUSD (Base)", "base", "hyUSD", "eUSD", 18, 18, vault='base'),
+    Market("0xb5d424e4af49244b074790f1f2dc9c20df948ce291fc6bcc6b59149ecf91196d", "cbETH/eUSD (Base)", "base", "cbETH", "eUSD", 18, 18, vault='base'),
+    Market("0xce89aeb081d719cd35cb1aafb31239c4dfd9c017b2fec26fc2e9a443461e9aea", "wstETH/eUSD (Base)", "base", "wstETH", "eUSD", 18, 18, vault='base'),
+    Market("0x9ec52d7195bafeba7137fa4d707a0f674a04a6d658c9066bcdbebc6d81eb0011", "ETH+/WETH", "ethereum", "ETH+", "WETH", 18, 18,
+           price_reference="0x3f4d007982a480dd99052c05d811cf6838ce61b2a2be8dc52fca107f783d1f15", liquidations=False),
+    Market("0xdf6aa0df4eb647966018f324db97aea09d2a7dde0d3c0a72115e8b20d58ea81f", "bsdETH/WETH (Base)", "base", "bsdETH", "WETH", 18, 18,
+           price_reference="0xf9ed1dba3b6ba1ede10e2115a9554e9c52091c9f1b1af21f9e0fecc855ee74bf"),
+]
+
+MARKETS_BY_KEY = {market.key: market for market in MARKETS}
+MARKET_KEYS = [market.key for market in MARKETS]
+MARKET_NAMES = {market.key: market.name for market in MARKETS}
+COLLATERAL_DECIMALS = {market.key: market.collateral_decimals for market in MARKETS}
+LIQUIDATION_MARKET_KEYS = [market.key for market in MARKETS if market.liquidations]
+LOAN_PRICE_REFERENCE = {market.key: market.price_reference for market in MARKETS if market.price_reference}
+
+
+def market_name(key):
+    # Display name, or the key itself for a market missing from the registry
+    return MARKET_NAMES.get(key, key)
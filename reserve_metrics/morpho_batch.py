@@ -0,0 +1,153 @@
+"""Compose several Morpho queries into one aliased GraphQL document.
+
+Each BatchPart becomes one aliased top-level field of the batched document, so
+a page can load all of its data in a single round trip. Paginated parts only
+carry their first page in the batch; further pages are walked afterwards with
+a standalone document, the pages of every paginated part concurrently.
+"""
+import threading
+from collections import deque
+
+from gql import gql
+
+from reserve_metrics.morpho_client import execute
+from reserve_metrics.morpho_pagination import PAGE_SIZE, iter_request_pages
+
+
+def select(fields):
+    """Selection set for dotted field paths.
+
+    `select(['uniqueKey', 'state.utilization', 'state.fee'])` gives
+    `{ uniqueKey state { utilization fee } }`, so a query asks for exactly the
+    fields its processors read.
+    """
+    tree = {}
+    for field in fields:
+        node = tree
+        for name in field.split("."):
+            node = node.setdefault(name, {})
+
+    def render(node):
+        return "{ " + " ".join(name + (" " + render(child) if child else "") for name, child in node.items()) + " }"
+
+    return render(tree)
+
+
+class BatchPart:
+    # `selection` is the field's selection set without the outer braces and
+    # `arguments` its argument list without parentheses (first/skip excluded).
+    # `variables` maps the names of the $variables `arguments` uses to their
+    # GraphQL types, so values that change between fetches are passed at
+    # execution instead of being written into the document
+
+    def __init__(self, alias, field, selection, arguments="", paginate=False, variables=None):
+        self.alias = alias
+        self.field = field
+        self.selection = selection
+        self.arguments = arguments
+        self.paginate = paginate
+        self.variables = variables or {}
+        self._page_document = None
+
+    def _selection_set(self):
+        if self.paginate:
+            return f"{{ pageInfo {{ countTotal }} {self.selection} }}"
+        return f"{{ {self.selection} }}"
+
+    def batch_text(self, page_size):
+        arguments = self.arguments
+        if self.paginate:
+            arguments = ", ".join(filter(None, [f"first: {page_size}, skip: 0", arguments]))
+        call = f"{self.field}({arguments})" if arguments else self.field
+        return f"{self.alias}: {call} {self._selection_set()}"
+
+    def page_document(self):
+        # Standalone document used to walk the pages after the first one
+        if self._page_document is None:
+            arguments = ", ".join(filter(None, ["first: $first, skip: $skip", self.arguments]))
+            declarations = _declarations(dict(self.variables, first="Int", skip="Int"))
+            self._page_document = gql(
+                f"query Page{declarations} {{ {self.field}({arguments}) {self._selection_set()} }}"
+            )
+        return self._page_document
+
+
+def _declarations(variables):
+    # "($name: Type, ...)" for a query's variables, or nothing without any
+    if not variables:
+        return ""
+    return "(" + ", ".join(f"${name}: {type_}" for name, type_ in variables.items()) + ")"
+
+
+def build_batch_document(parts, page_size=PAGE_SIZE):
+    fields = "\n".join(part.batch_text(page_size) for part in parts)
+    variables = {name: type_ for part in parts for name, type_ in part.variables.items()}
+    return gql(f"query Batch{_declarations(variables)} {{\n{fields}\n}}")
+
+
+def compile_batch(parts, page_size=PAGE_SIZE):
+    # Parse the batched document and every page document up front, so a fixed
+    # set of parts is parsed once (at import) instead of on every fetch
+    for part in parts:
+        if part.paginate:
+            part.page_document()
+    return build_batch_document(parts, page_size)
+
+
+class _SharedPages:
+    # One concurrent walk over the pages of several parts, read as one
+    # iterator per part. Pages of a part that isn't being read are held until
+    # it is
+
+    def __init__(self, requests, page_size):
+        self._walk = iter_request_pages(requests, page_size)
+        self._waiting = [deque() for _ in requests]
+        self._lock = threading.Lock()
+
+    def pages(self, index):
+        waiting = self._waiting[index]
+        while True:
+            with self._lock:
+                if waiting:
+                    items = waiting.popleft()
+                else:
+                    for other, items in self._walk:
+                        if other == index:
+                            break
+                        self._waiting[other].append(items)
+                    else:
+                        return
+            yield items
+
+
+def execute_batch(parts, page_size=PAGE_SIZE, document=None, variables=None):
+    """Run all parts in one request and split the response by alias.
+
+    `document` is the parts' batched document from compile_batch, built on
+    the fly when not given. `variables` holds the values of the parts'
+    $variables, and is passed on to the requests for further pages.
+
+    Plain parts come back as `{field: connection}`, the same shape a
+    standalone query for that field returns. Paginated parts come back as an
+    iterator of item pages, starting with the page already in the batch. The
+    further pages of all paginated parts are fetched in one concurrent walk;
+    pages arriving for a part other than the one being read are held until
+    that part is read, so read the largest part first.
+    """
+    if document is None:
+        document = build_batch_document(parts, page_size)
+    response = execute(document, variables)
+
+    paginated = [part for part in parts if part.paginate]
+    shared = _SharedPages([
+        (part.page_document(), part.field, {name: variables[name] for name in part.variables}, response[part.alias])
+        for part in paginated
+    ], page_size)
+
+    results = {}
+    for part in parts:
+        if part.paginate:
+            results[part.alias] = shared.pages(paginated.index(part))
+        else:
+            results[part.alias] = {part.field: response[part.alias]}
+    return results
@@ -0,0 +1,138 @@
+"""Process-wide client for the Morpho Blue GraphQL API.
+
+All fetchers share one connected gql session, so repeated queries reuse the
+same keep-alive connection pool and the schema is only loaded once.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from gql import Client
+
+from reserve_metrics.storage import DATA_DIR
+
+try:
+    from gql import GraphQLRequest
+except ImportError:  # gql < 4 executes documents with variable_values directly
+    GraphQLRequest = None
+
+MORPHO_API_URL = os.environ.get("MORPHO_API_URL", "https://blue-api.morpho.org/graphql")
+
+# Timeouts in seconds, (connect, read) as understood by requests
+CONNECT_TIMEOUT = float(os.environ.get("MORPHO_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("MORPHO_READ_TIMEOUT", 30))
+RETRIES = int(os.environ.get("MORPHO_RETRIES", 3))
+POOL_SIZE = int(os.environ.get("MORPHO_POOL_SIZE", 10))
+
+# Introspection result cached with the other local data, outside the package
+# so installs can be read-only; written on first use and rewritten by
+# refresh_schema()
+SCHEMA_PATH = Path(os.environ.get("MORPHO_SCHEMA_PATH", DATA_DIR / "morpho_schema.json"))
+
+_lock = threading.Lock()
+_client = None
+_session = None
+
+
+def _make_transport():
+    # The transport pulls in requests; importing it here keeps it off the
+    # import path of pages that only read cached results
+    from gql.transport.requests import RequestsHTTPTransport
+
+    return RequestsHTTPTransport(
+        url=MORPHO_API_URL,
+        verify=True,
+        retries=RETRIES,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+    )
+
+
+def _mount_pool(transport):
+    # gql mounts a default-sized adapter; replace it with one sized for
+    # concurrent fetches so connections are kept alive instead of discarded
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=POOL_SIZE,
+        max_retries=Retry(
+            total=RETRIES,
+            backoff_factor=0.1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=None,
+        ),
+    )
+    transport.session.mount("https://", adapter)
+    transport.session.mount("http://", adapter)
+
+
+def _fetch_introspection():
+    client = Client(transport=_make_transport(), fetch_schema_from_transport=True)
+    with client:
+        pass
+    return client.introspection
+
+
+def load_schema(refresh=False):
+    # Returns the introspection dict, reading the cached copy unless asked to refresh
+    if not refresh and SCHEMA_PATH.exists():
+        with open(SCHEMA_PATH) as f:
+            return json.load(f)
+
+    introspection = _fetch_introspection()
+    try:
+        SCHEMA_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(SCHEMA_PATH, "w") as f:
+            json.dump(introspection, f)
+    except OSError:
+        # Read-only deployments still get the schema for this process
+        pass
+    return introspection
+
+
+def get_session():
+    global _client, _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                try:
+                    introspection = load_schema()
+                except Exception:
+                    # Schema is only used for local validation; run without it
+                    introspection = None
+                transport = _make_transport()
+                client = Client(transport=transport, introspection=introspection)
+                session = client.connect_sync()
+                _mount_pool(transport)
+                _client, _session = client, session
+    return _session
+
+
+def refresh_schema():
+    # Re-download the schema and reconnect so the new schema is used for validation
+    global _client, _session
+    introspection = load_schema(refresh=True)
+    with _lock:
+        if _client is not None:
+            _client.close_sync()
+        _client, _session = None, None
+    return introspection
+
+
+def execute(document, variables=None):
+    session = get_session()
+    if GraphQLRequest is not None:
+        return session.execute(GraphQLRequest(document, variable_values=variables))
+    return session.execute(document, variable_values=variables)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--refresh-schema" in sys.argv:
+        refresh_schema()
+        print(f"Saved Morpho schema to {SCHEMA_PATH}")
+    else:
+        print("Usage: python -m reserve_metrics.morpho_client --refresh-schema")
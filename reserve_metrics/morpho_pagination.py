@@ -0,0 +1,101 @@
+"""Skip-based pagination over Morpho list queries.
+
+Documents passed here must declare `$first: Int` and `$skip: Int`, pass them to
+the list field and select `pageInfo { countTotal }` next to `items`.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from reserve_metrics.morpho_client import execute
+
+# The Morpho API rejects pages larger than 1000 items
+PAGE_SIZE = int(os.environ.get("MORPHO_PAGE_SIZE", 1000))
+MAX_WORKERS = int(os.environ.get("MORPHO_MAX_WORKERS", 4))
+
+
+class _Walk:
+    # Pagination state of one (document, field, variables) request
+
+    def __init__(self, document, field, variables, first_page=None):
+        self.document = document
+        self.field = field
+        self.variables = variables or {}
+        self.next_skip = 0
+        self.total = None
+        self.exhausted = False
+        self.in_flight = 0
+        self.first_page = first_page
+
+    def record(self, connection, page_size):
+        page_info = connection.get('pageInfo') or {}
+        if page_info.get('countTotal') is not None:
+            self.total = page_info['countTotal']
+        # A short page means we walked past the end
+        if len(connection['items']) < page_size:
+            self.exhausted = True
+
+    def has_more(self):
+        if self.exhausted:
+            return False
+        return self.total is None or self.next_skip < self.total
+
+
+def iter_pages(requests, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    """Yield the `items` list of every page of every request as it arrives.
+
+    `requests` is a list of (document, field, variables) tuples, optionally
+    with a fourth element holding the already fetched first page (the
+    connection dict) so the walk continues from the second page. Pages of the
+    same request and of different requests are fetched concurrently, with at
+    most `max_workers` pages in flight so only that many are held in memory.
+    Pages are yielded in completion order, not skip order.
+    """
+    for _, items in iter_request_pages(requests, page_size, max_workers):
+        yield items
+
+
+def iter_request_pages(requests, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    # iter_pages, yielding (index of the request in `requests`, items)
+    walks = [_Walk(*request) for request in requests]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+
+        def submit(walk):
+            variables = dict(walk.variables, first=page_size, skip=walk.next_skip)
+            walk.next_skip += page_size
+            walk.in_flight += 1
+            pending[pool.submit(execute, walk.document, variables)] = walk
+
+        def fill(walk):
+            while walk.has_more() and walk.in_flight < max_workers:
+                submit(walk)
+
+        seeded = [walk for walk in walks if walk.first_page is not None]
+        for walk in walks:
+            if walk.first_page is None:
+                submit(walk)
+            else:
+                walk.next_skip = page_size
+                walk.record(walk.first_page, page_size)
+                fill(walk)
+
+        for walk in seeded:
+            items, walk.first_page = walk.first_page['items'], None
+            yield walks.index(walk), items
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                walk = pending.pop(future)
+                walk.in_flight -= 1
+                connection = future.result()[walk.field]
+                walk.record(connection, page_size)
+                fill(walk)
+                yield walks.index(walk), connection['items']
+
+
+def iter_items(requests, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    # Flattened view of iter_pages for callers that handle one item at a time
+    for items in iter_pages(requests, page_size, max_workers):
+        yield from items
@@ -0,0 +1,47 @@
+"""Supplier counts of the eUSD vaults, straight from the vault positions.
+
+    $ python -m reserve_metrics.morpho_suppliers
+"""
+from gql import gql
+from reserve_metrics.markets import VAULTS
+from reserve_metrics.morpho_pagination import iter_items
+
+# Paginated vault positions query, walked until every supplier is seen
+query = gql("""
+query VaultPositions($first: Int, $skip: Int, $vaults: [String!]) {
+  vaultPositions(
+    first: $first
+    skip: $skip
+    orderBy: Shares
+    orderDirection: Desc
+    where: { vaultAddress_in: $vaults }
+  ) {
+    pageInfo {
+      countTotal
+    }
+    items {
+      shares
+      assets
+      assetsUsd
+      user {
+        address
+      }
+    }
+  }
+}
+""")
+
+
+def count_suppliers(vault_key):
+    """Suppliers with more than $5 in the VAULTS entry `vault_key`.
+
+    Walks every vault position page; nothing is fetched until it's called.
+    """
+    request = (query, 'vaultPositions', {'vaults': [VAULTS[vault_key].address]})
+    return sum(1 for item in iter_items([request]) if float(item['assetsUsd']) > 5)
+
+
+if __name__ == "__main__":
+    # Print the results
+    print(f"Number of suppliers on Ethereum Mainnet: {count_suppliers('mainnet')}")
+    print(f"Number of suppliers on Base: {count_suppliers('base')}")
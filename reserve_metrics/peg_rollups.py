@@ -0,0 +1,251 @@
+"""Daily and monthly rollups of the peg prices, and depeg episodes.
+
+Maintained next to the raw prices in peg.sqlite and updated after each sync
+for the range it touched, so the peg page reads small precomputed tables
+instead of resampling every stored hour.
+
+Each rollup row counts the samples (hours) of a network in the period,
+how many of them fell in each peg band, and the extremes. An episode is a
+run of consecutive samples further than DEPEG_THRESHOLD from $1.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from reserve_metrics.peg_store import DB_NAME, NETWORK_COLUMNS
+from reserve_metrics.storage import connect
+
+# Bands from tightest to widest, as (name, low, high) with inclusive bounds;
+# a sample belongs to the tightest band containing it, or to "Off-peg"
+BANDS = [
+    ("Excellent", 0.999, 1.001),
+    ("Good", 0.998, 1.002),
+    ("Fair", 0.995, 1.005),
+    ("Poor", 0.990, 1.010),
+]
+OFF_PEG = "Off-peg"
+BAND_COLUMNS = {name: f"samples_{name.lower().replace('-', '_')}" for name in [band[0] for band in BANDS] + [OFF_PEG]}
+
+DEPEG_THRESHOLD = float(os.environ.get("PEG_DEPEG_THRESHOLD", 0.005))
+
+DAY = 86400
+
+_STAT_COLUMNS = ["samples", "price_sum", "min_price", "max_price", "max_deviation"] + list(BAND_COLUMNS.values())
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS peg_daily (
+    day INTEGER NOT NULL,
+    network TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in _STAT_COLUMNS)},
+    PRIMARY KEY (day, network)
+);
+CREATE TABLE IF NOT EXISTS peg_monthly (
+    month TEXT NOT NULL,
+    network TEXT NOT NULL,
+    {', '.join(f'{column} REAL' for column in _STAT_COLUMNS)},
+    PRIMARY KEY (month, network)
+);
+CREATE TABLE IF NOT EXISTS peg_episodes (
+    network TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    worst_price REAL NOT NULL,
+    max_deviation REAL NOT NULL,
+    PRIMARY KEY (network, start)
+);
+"""
+
+
+def _connect():
+    conn = connect(DB_NAME)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def band_of(prices):
+    # Band name of every price, vectorized over the series
+    prices = np.asarray(prices, dtype=float)
+    conditions = [(prices >= low) & (prices <= high) for _, low, high in BANDS]
+    return np.select(conditions, [name for name, _, _ in BANDS], default=OFF_PEG)
+
+
+def _hourly(conn, since):
+    df = pd.read_sql_query(
+        "SELECT hour, network, avg_price FROM peg_prices WHERE hour >= ? AND avg_price IS NOT NULL ORDER BY network, hour",
+        conn, params=(since,),
+    )
+    df['deviation'] = (df['avg_price'] - 1).abs()
+    band = band_of(df['avg_price'])
+    for name, column in BAND_COLUMNS.items():
+        df[column] = band == name
+    return df
+
+
+def _rollup(df, period):
+    # Sum or extreme of every statistic per (period, network)
+    return df.groupby([period, 'network']).agg(
+        samples=('avg_price', 'size'),
+        price_sum=('avg_price', 'sum'),
+        min_price=('avg_price', 'min'),
+        max_price=('avg_price', 'max'),
+        max_deviation=('deviation', 'max'),
+        **{column: (column, 'sum') for column in BAND_COLUMNS.values()},
+    ).reset_index()
+
+
+def _rollup_rollups(df, period):
+    # Monthly rows from daily ones
+    return df.groupby([period, 'network']).agg(
+        samples=('samples', 'sum'),
+        price_sum=('price_sum', 'sum'),
+        min_price=('min_price', 'min'),
+        max_price=('max_price', 'max'),
+        max_deviation=('max_deviation', 'max'),
+        **{column: (column, 'sum') for column in BAND_COLUMNS.values()},
+    ).reset_index()
+
+
+def find_episodes(df):
+    """Runs of consecutive samples per network beyond DEPEG_THRESHOLD.
+
+    `df` holds hour, network, avg_price and deviation sorted by network and
+    hour. Returns one row per episode.
+    """
+    off = df['deviation'] > DEPEG_THRESHOLD
+    # A new run starts wherever the off-peg flag or the network changes
+    run = ((off != off.shift()) | (df['network'] != df['network'].shift())).cumsum()
+    episodes = df[off].assign(run=run[off])
+    if episodes.empty:
+        return pd.DataFrame(columns=['network', 'start', 'end', 'samples', 'worst_price', 'max_deviation'])
+    worst = episodes.loc[episodes.groupby('run')['deviation'].idxmax(), ['run', 'avg_price']]
+    grouped = episodes.groupby('run').agg(
+        network=('network', 'first'),
+        start=('hour', 'min'),
+        end=('hour', 'max'),
+        samples=('hour', 'size'),
+        max_deviation=('deviation', 'max'),
+    )
+    grouped['worst_price'] = worst.set_index('run')['avg_price']
+    return grouped.reset_index(drop=True)[['network', 'start', 'end', 'samples', 'worst_price', 'max_deviation']]
+
+
+def _upsert(conn, table, df):
+    columns = list(df.columns)
+    rows = df.astype(object).where(df.notna(), None)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        rows.itertuples(index=False, name=None),
+    )
+
+
+def update(since=None):
+    """Recompute the rollups and episodes for hours at or after `since`.
+
+    `since` is a UTC timestamp (or datetime); None rebuilds everything.
+    Whole days and months containing `since` are recomputed, as is any
+    episode still running at that point.
+    """
+    since = 0 if since is None else int(pd.Timestamp(since).timestamp())
+    day_start = since - since % DAY
+    month_start = pd.Timestamp(day_start, unit='s').strftime('%Y-%m')
+    month_start_ts = int(pd.Timestamp(month_start + "-01").timestamp())
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Episodes reaching the last sample before `since` may continue
+            # into it: drop them and recompute from where they started
+            previous = conn.execute("SELECT MAX(hour) FROM peg_prices WHERE hour < ?", (since,)).fetchone()[0]
+            episodes_from = since
+            if previous is not None:
+                started = conn.execute("SELECT MIN(start) FROM peg_episodes WHERE end >= ?", (previous,)).fetchone()[0]
+                if started is not None:
+                    episodes_from = min(episodes_from, started)
+            hours_from = min(day_start, episodes_from)
+
+            hourly = _hourly(conn, hours_from)
+            hourly['day'] = hourly['hour'] - hourly['hour'] % DAY
+
+            daily = _rollup(hourly[hourly['hour'] >= day_start], 'day')
+            conn.execute("DELETE FROM peg_daily WHERE day >= ?", (day_start,))
+            _upsert(conn, 'peg_daily', daily)
+
+            stored_daily = pd.read_sql_query("SELECT * FROM peg_daily WHERE day >= ?", conn, params=(month_start_ts,))
+            stored_daily['month'] = pd.to_datetime(stored_daily['day'], unit='s').dt.strftime('%Y-%m')
+            monthly = _rollup_rollups(stored_daily, 'month')
+            conn.execute("DELETE FROM peg_monthly WHERE month >= ?", (month_start,))
+            _upsert(conn, 'peg_monthly', monthly)
+
+            conn.execute("DELETE FROM peg_episodes WHERE start >= ? OR end >= ?", (episodes_from, episodes_from))
+            _upsert(conn, 'peg_episodes', find_episodes(hourly[hourly['hour'] >= episodes_from]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def is_empty():
+    # True before the first update, e.g. for prices stored before rollups existed
+    conn = _connect()
+    try:
+        return conn.execute("SELECT 1 FROM peg_daily LIMIT 1").fetchone() is None
+    finally:
+        conn.close()
+
+
+def _read(query, params=()):
+    conn = _connect()
+    try:
+        return pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def _networks(present):
+    # Every configured network, plus any others stored, in name order
+    return sorted(set(NETWORK_COLUMNS.values()) | set(present))
+
+
+def read_monthly():
+    # Monthly rollups with the average price, month as a timestamp. Every
+    # configured network gets a row for every month, so a network without any
+    # price yet (rollups skip null prices) still shows up, with no samples
+    df = _read("SELECT * FROM peg_monthly ORDER BY month, network")
+    df['month'] = pd.to_datetime(df['month'])
+    networks = _networks(df['network'])
+    index = pd.MultiIndex.from_product([df['month'].unique(), networks], names=['month', 'network'])
+    df = df.set_index(['month', 'network']).reindex(index).reset_index()
+    counts = ['samples'] + list(BAND_COLUMNS.values())
+    df[counts] = df[counts].fillna(0)
+    df['avg_price'] = df['price_sum'] / df['samples'].where(df['samples'] > 0)
+    return df
+
+
+def read_time_in_band():
+    # Share of all samples of each network that fell in each band, plus its
+    # largest deviation from $1. Networks without any price yet get a row of
+    # their own with no shares, as in read_monthly
+    df = _read(
+        "SELECT network, SUM(samples) AS samples, MAX(max_deviation) AS max_deviation, "
+        + ", ".join(f"SUM({column}) AS {column}" for column in BAND_COLUMNS.values())
+        + " FROM peg_daily GROUP BY network ORDER BY network"
+    ).set_index('network')
+    df = df.reindex(pd.Index(_networks(df.index), name='network'))
+    shares = pd.DataFrame({
+        name: df[column] / df['samples'] for name, column in BAND_COLUMNS.items()
+    })
+    shares['Max Deviation'] = df['max_deviation']
+    return shares
+
+
+def read_episodes():
+    # Depeg episodes, most recent first, with start and end as timestamps
+    df = _read("SELECT * FROM peg_episodes ORDER BY start DESC")
+    df['start'] = pd.to_datetime(df['start'], unit='s')
+    df['end'] = pd.to_datetime(df['end'], unit='s')
+    return df
@@ -0,0 +1,90 @@
+"""Local store of the hourly eUSD peg prices, one row per (hour, network).
+
+The Dune query returns one wide row per hour with a price column per
+network; rows are stored long, so the peg page reads them in the shape it
+charts without melting the full history on every refresh.
+"""
+import pandas as pd
+
+from reserve_metrics.storage import connect
+
+DB_NAME = "peg.sqlite"
+
+# Dune result column -> network name shown on the page
+NETWORK_COLUMNS = {
+    'avg_price_ethereum': 'Ethereum',
+    'avg_price_base': 'Base',
+    'avg_price_arbitrum': 'Arbitrum',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peg_prices (
+    hour INTEGER NOT NULL,
+    network TEXT NOT NULL,
+    avg_price REAL,
+    PRIMARY KEY (hour, network)
+);
+"""
+
+
+def _connect():
+    conn = connect(DB_NAME)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def last_hour():
+    # Newest stored hour as a UTC timestamp, or None when the store is empty
+    conn = _connect()
+    try:
+        hour = conn.execute("SELECT MAX(hour) FROM peg_prices").fetchone()[0]
+    finally:
+        conn.close()
+    return None if hour is None else pd.Timestamp(hour, unit='s', tz='UTC')
+
+
+def ingest(df):
+    """Store the hourly rows of a wide Dune result and return how many there were.
+
+    Rows already stored are replaced, so prices of an hour that was still in
+    progress at the previous sync are updated.
+    """
+    if df.empty:
+        return 0
+    long = df.melt(
+        id_vars='hour',
+        value_vars=[column for column in NETWORK_COLUMNS if column in df.columns],
+        var_name='network',
+        value_name='avg_price',
+    )
+    long['hour'] = pd.to_datetime(long['hour'], utc=True).astype('int64') // 10 ** 9
+    long['network'] = long['network'].map(NETWORK_COLUMNS)
+    long['avg_price'] = pd.to_numeric(long['avg_price'], errors='coerce')
+    rows = long.astype(object).where(long.notna(), None)
+
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO peg_prices (hour, network, avg_price) VALUES (?, ?, ?)",
+                rows[['hour', 'network', 'avg_price']].itertuples(index=False, name=None),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return len(df)
+
+
+def read_prices():
+    # Every stored price in hour order: hour (UTC, tz-naive), network, avg_price
+    conn = _connect()
+    try:
+        df = pd.read_sql_query("SELECT hour, network, avg_price FROM peg_prices ORDER BY hour, network", conn)
+    finally:
+        conn.close()
+    df['hour'] = pd.to_datetime(df['hour'], unit='s')
+    return df
@@ -0,0 +1,135 @@
+"""Typed long-format store of the weekly RToken spreadsheets.
+
+The spreadsheets are exported as wide CSVs with one row per asset and one
+column per week, labelled month/day without a year, with values such as
+"$1,234.56". Ingesting one parses it once into rows of (asset, date, value)
+saved as Parquet under DATA_DIR; the pages load that store instead of
+re-parsing the CSV.
+
+Weeks carry no year, so the first column is taken to be in FIRST_YEAR and
+the year advances whenever a column's month/day comes before the previous
+one's.
+
+To ingest the spreadsheets after updating them:
+
+    $ python -m reserve_metrics.rtoken_store
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+from reserve_metrics.storage import DATA_DIR
+
+ROOT = Path(__file__).resolve().parent.parent
+
+FIRST_YEAR = int(os.environ.get("RTOKEN_FIRST_YEAR", 2024))
+
+# `asset_column` names the spreadsheet's asset column; other columns that
+# aren't weeks (such as a precomputed change) are ignored
+Sheet = namedtuple("Sheet", ["csv", "parquet", "asset_column"])
+
+SHEETS = {
+    'liquidity': Sheet("rtoken_liquidity.csv", "rtoken_liquidity.parquet", "Asset Name"),
+    'safety': Sheet("rtoken_safety.csv", "rtoken_safety.parquet", "RToken"),
+}
+
+WEEK_PATTERN = re.compile(r"^\s*(\d{1,2})/(\d{1,2})\s*$")
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def week_dates(labels, first_year=FIRST_YEAR):
+    """Dates of month/day column labels given in chronological order."""
+    dates = []
+    year = first_year
+    for label in labels:
+        month, day = (int(part) for part in WEEK_PATTERN.match(label).groups())
+        if dates and (month, day) < (dates[-1].month, dates[-1].day):
+            year += 1
+        dates.append(pd.Timestamp(year=year, month=month, day=day))
+    return dates
+
+
+def parse_sheet(df, asset_column, first_year=FIRST_YEAR):
+    """Long frame of (asset, date, value) from a wide weekly spreadsheet.
+
+    `asset` is categorical in spreadsheet row order, which orders the rows
+    within each date, `value` a float with currency signs and thousands
+    separators removed. `load` hands `asset` out as plain strings.
+    """
+    weeks = [column for column in df.columns if WEEK_PATTERN.match(str(column))]
+    values = df[weeks].astype(str).replace(r"[\$,\s]", "", regex=True)
+    values.columns = week_dates(weeks, first_year)
+    values.index = df[asset_column]
+    long = values.rename_axis(index='asset', columns='date').stack(future_stack=True).rename('value').reset_index()
+    long['value'] = pd.to_numeric(long['value'], errors='coerce')
+    long['asset'] = pd.Categorical(long['asset'], categories=df[asset_column].unique())
+    return long.sort_values(['date', 'asset'], kind='stable').reset_index(drop=True)
+
+
+def ingest(name, first_year=FIRST_YEAR):
+    # Parse the spreadsheet of `name` and replace its Parquet store
+    sheet = SHEETS[name]
+    long = parse_sheet(pd.read_csv(ROOT / sheet.csv, dtype=str), sheet.asset_column, first_year)
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / sheet.parquet
+    temporary = path.with_suffix(".tmp")
+    long.to_parquet(temporary, index=False)
+    os.replace(temporary, path)
+    return long
+
+
+def load_versioned(name):
+    """(version, long frame) of `name`, read once per version of its Parquet store.
+
+    The version is the store's mtime, so it changes whenever the frame does.
+    The spreadsheet is ingested first when the store is missing or older
+    than it. The returned frame is shared between callers; copy it before
+    modifying it.
+    """
+    sheet = SHEETS[name]
+    path = DATA_DIR / sheet.parquet
+    with _lock:
+        if not path.exists() or path.stat().st_mtime_ns < (ROOT / sheet.csv).stat().st_mtime_ns:
+            ingest(name)
+        version = path.stat().st_mtime_ns
+        cached = _loaded.get(name)
+        if cached is None or cached[0] != version:
+            long = pd.read_parquet(path)
+            # Plain strings for the pages: plotly groups by asset, and grouping
+            # by a categorical warns about pandas' changing `observed` default
+            long['asset'] = long['asset'].astype(str)
+            cached = _loaded[name] = (version, long)
+    return cached
+
+
+def load(name):
+    # Long frame of `name`, see load_versioned
+    return load_versioned(name)[1]
+
+
+def wide(long):
+    # Back to one row per asset and one column per date, in date order. Rows
+    # are sorted by date then asset, so assets first appear in spreadsheet order
+    table = long.pivot(index='asset', columns='date', values='value').sort_index(axis=1)
+    return table.reindex(pd.Index(long['asset'].unique(), dtype=object, name='asset'))
+
+
+def weekly_change(long):
+    # Relative change of every asset between its two latest weeks
+    table = wide(long)
+    if table.shape[1] < 2:
+        return pd.Series(float('nan'), index=table.index)
+    return table.iloc[:, -1] / table.iloc[:, -2] - 1
+
+
+if __name__ == "__main__":
+    for name in SHEETS:
+        long = ingest(name)
+        print(f"Ingested {SHEETS[name].csv}: {long['asset'].nunique()} assets, "
+              f"{long['date'].nunique()} weeks into {DATA_DIR / SHEETS[name].parquet}")
@@ -0,0 +1,144 @@
+"""Background refresh of every dashboard data source.
+
+Each job wraps a persistent_cache fetcher and is refreshed once its cached
+result reaches `lead` of its TTL, so it is renewed before a page would
+otherwise find it expired. Every result is published as a snapshot, and
+pages read those snapshots instead of calling upstream APIs.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from reserve_metrics import snapshots
+
+log = logging.getLogger(__name__)
+
+# How often the loop wakes up at most, and how long failed jobs wait at most
+POLL_INTERVAL = 30
+MAX_RETRY_DELAY = 600
+
+
+class Job:
+
+    def __init__(self, name, fetcher, args=(), lead=0.8):
+        self.name = name
+        self.fetcher = fetcher
+        self.args = tuple(args)
+        self.lead = lead
+        self.failures = 0
+        self.retry_at = 0
+        self.running = False
+
+    def due_at(self):
+        snapshot = snapshots.get(self.name)
+        if snapshot is None:
+            return self.retry_at
+        info = self.fetcher.info(*self.args)
+        if info.fetched_at is None:
+            return self.retry_at
+        if info.fetched_at > snapshot.published_at:
+            # Refreshed outside the scheduler (e.g. a finished Dune execution)
+            return self.retry_at
+        return max(info.fetched_at + self.fetcher.ttl * self.lead, self.retry_at)
+
+    def run(self):
+        info = self.fetcher.info(*self.args)
+        if info.age is not None and info.age < self.fetcher.ttl * self.lead:
+            # The cache is still fresh enough: after a restart, or refreshed
+            # outside the scheduler since the last publish
+            value = self.fetcher(*self.args)
+        else:
+            value = self.fetcher.refresh(*self.args)
+        snapshots.publish(self.name, value)
+
+
+class RefreshScheduler:
+
+    def __init__(self, workers=int(os.environ.get("REFRESH_WORKERS", 2))):
+        self.jobs = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresh")
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, job):
+        # Adding a job under an existing name keeps the existing one
+        with self._lock:
+            if job.name not in self.jobs:
+                self.jobs[job.name] = job
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+                self._thread.start()
+
+    def _run_job(self, job):
+        try:
+            job.run()
+            job.failures = 0
+            job.retry_at = 0
+        except Exception:
+            job.failures += 1
+            job.retry_at = time.time() + min(30 * 2 ** job.failures, MAX_RETRY_DELAY)
+            log.exception("Refreshing %s failed", job.name)
+        finally:
+            job.running = False
+            self._wake.set()
+
+    def _loop(self):
+        while True:
+            now = time.time()
+            next_due = now + POLL_INTERVAL
+            with self._lock:
+                jobs = list(self.jobs.values())
+            for job in jobs:
+                if job.running:
+                    continue
+                due = job.due_at()
+                if due <= now:
+                    job.running = True
+                    self._pool.submit(self._run_job, job)
+                else:
+                    next_due = min(next_due, due)
+            self._wake.wait(max(next_due - time.time(), 1))
+            self._wake.clear()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def default_jobs():
+    from reserve_metrics import dune_queries, lending
+
+    jobs = [
+        Job("lending.markets", lending.fetch_market_sources),
+        Job("lending.liquidations", lending.fetch_liquidations),
+    ]
+    if dune_queries.has_api_key():
+        jobs += [
+            Job("peg.prices", dune_queries.fetch_peg_prices, (dune_queries.PEG_QUERY_ID, dune_queries.PEG_TIMEPERIOD)),
+            Job("fintech.aum", dune_queries.fetch_fintech_balances, (dune_queries.FINTECH_AUM_QUERY_ID,)),
+        ]
+    return jobs
+
+
+def start_background_refresh():
+    """Start the process-wide scheduler with every default job.
+
+    Safe to call on every page run: the scheduler is created once, and jobs
+    whose credentials only became available later (the Dune key) are added
+    on a later call.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RefreshScheduler()
+    for job in default_jobs():
+        _scheduler.add(job)
+    _scheduler.start()
+    return _scheduler
@@ -0,0 +1,44 @@
+"""Process-wide registry of the latest published result of each data source.
+
+The refresh scheduler publishes into it and pages only read from it. A
+published Snapshot is never modified; a refresh publishes a new one with a
+higher version. Every session references the same value instead of keeping
+a copy in its session state, so pages derive new frames from it rather than
+modifying it, and pick up a new version on their next rerun.
+"""
+import threading
+import time
+from collections import namedtuple
+
+Snapshot = namedtuple("Snapshot", ["name", "version", "published_at", "value"])
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def publish(name, value):
+    with _lock:
+        previous = _snapshots.get(name)
+        version = 1 if previous is None else previous.version + 1
+        snapshot = Snapshot(name, version, time.time(), value)
+        _snapshots[name] = snapshot
+    return snapshot
+
+
+def get(name):
+    return _snapshots.get(name)
+
+
+def current(name, fallback):
+    # Newest snapshot; before the first publish (cold start) call `fallback`
+    # and publish its result. Its version identifies the value, e.g. as a
+    # cache key for what's derived from it
+    snapshot = _snapshots.get(name)
+    if snapshot is None:
+        snapshot = publish(name, fallback())
+    return snapshot
+
+
+def latest(name, fallback):
+    # Value of the newest snapshot, see `current`
+    return current(name, fallback).value
@@ -0,0 +1,15 @@
+"""Location of and connections to the local data stores."""
+import os
+import sqlite3
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get("RESERVE_DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+
+
+def connect(filename):
+    # Autocommit connection; writers open their own `BEGIN IMMEDIATE` so
+    # concurrent sessions serialize on the database lock
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DATA_DIR / filename, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
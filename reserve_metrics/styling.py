@@ -0,0 +1,32 @@
+"""Table highlighting computed column-wise instead of per cell.
+
+`Styler.map` calls a Python function for every cell on every rerun. Here
+the CSS of the whole table is computed from vectorized boolean masks into
+one frame. Pages compute the table and its CSS frame in functions
+decorated with `figure_cache.version_cache`, called with the version of
+the data shown. On every render they wrap both in a new Styler with
+`styled`: st.dataframe recomputes a Styler's contents in place, so one
+Styler can't be shared between sessions.
+"""
+import numpy as np
+import pandas as pd
+
+
+def css_from_rules(df, rules, default=''):
+    """CSS frame shaped like `df` from (mask, css) rules.
+
+    Masks are boolean arrays shaped like `df`; a cell gets the CSS of the
+    first rule whose mask is true for it, or `default`.
+    """
+    masks = [np.asarray(mask, dtype=bool) for mask, _ in rules]
+    values = np.select(masks, [css for _, css in rules], default=default) if rules else np.full(df.shape, default)
+    return pd.DataFrame(values, index=df.index, columns=df.columns)
+
+
+def styled(df, css):
+    """New Styler of `df` showing the CSS frame `css`.
+
+    `css` covers some or all of the columns of `df`, e.g. from
+    `css_from_rules` applied to them.
+    """
+    return df.style.apply(lambda _: css, axis=None, subset=css.columns)
@@ -1,4 +1,6 @@
 import streamlit as st
+from reserve_metrics import assets
+from reserve_metrics.scheduler import start_background_refresh
 
 st.set_page_config(
     page_title="Home",
@@ -7,6 +9,11 @@ st.set_page_config(
 
 st.sidebar.header("Home")
 
+# Start refreshing every page's data in the background so the first visit to
+# a page finds it ready; secrets are loaded first so Dune jobs are included
+st.secrets.load_if_toml_exists()
+start_background_refresh()
+
 # Custom CSS for minimal styling
 st.markdown("""
     <style>
@@ -33,7 +40,12 @@ st.markdown("""
 
 # Header with logo and title
 
-st.image('reserve-blue.png', width=250)
+# Resized variants served as static files, or the original until they're built
+logo = assets.picture('reserve-blue.png', '250px', width=250)
+if logo is None:
+    st.image('reserve-blue.png', width=250)
+else:
+    st.markdown(logo, unsafe_allow_html=True)
 st.markdown("---")
 st.subheader("Health Metrics Dashboard")
 st.markdown("---")
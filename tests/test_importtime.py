@@ -0,0 +1,13 @@
+import pytest
+
+from reserve_metrics import importtime
+
+
+@pytest.mark.parametrize("path", importtime.PAGES, ids=lambda path: path.name)
+def test_page_imports_within_budget(path):
+    # Every import outside a function is measured, and the fastest of a few
+    # cold runs stays within the page's budget
+    assert importtime.late_imports(path) == []
+    total, modules = min((importtime.measure(path) for _ in range(3)), key=lambda run: run[0])
+    heaviest = ", ".join(f"{module} {cumulative / 1000:.0f} ms" for module, cumulative in modules[:5])
+    assert total / 1000 <= importtime.budget_ms(path), f"{total / 1000:.0f} ms: {heaviest}"
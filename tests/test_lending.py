@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from reserve_metrics import lending
+from reserve_metrics.bench_market_positions import legacy_process_market_positions, synthetic_pages
+
+
+def assert_matches_loop(pages):
+    expected = legacy_process_market_positions(pages)
+    actual = lending.process_market_positions(iter(pages))
+    # Only the index labels differ: the loop is run without names
+    actual.index = expected.index
+    pd.testing.assert_frame_equal(
+        actual.astype(object), expected, check_dtype=False, check_exact=False, rtol=1e-9,
+    )
+
+
+@pytest.mark.parametrize("n", [1, 1_000, lending.LOOP_THRESHOLD, lending.CHUNK_SIZE + 2_500])
+def test_market_positions_match_loop(n):
+    # Covers the loop, a single columnar chunk, and several chunks combined
+    assert_matches_loop(synthetic_pages(n))
+
+
+def test_market_positions_match_loop_across_small_chunks(monkeypatch):
+    # Partial totals of mixed loop and columnar chunks combine to the same result
+    monkeypatch.setattr(lending, "CHUNK_SIZE", 3_000)
+    monkeypatch.setattr(lending, "LOOP_THRESHOLD", 2_000)
+    assert_matches_loop(synthetic_pages(7_500, page_size=500))
+
+
+def test_no_market_positions():
+    df = lending.process_market_positions(iter([]))
+    assert df.empty
+    assert list(df.columns) == lending.POSITION_COLUMNS
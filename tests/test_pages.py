@@ -0,0 +1,33 @@
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from reserve_metrics import dune_queries, scheduler
+
+SECRET = "dune-key-that-must-not-render"
+
+
+def rendered(node):
+    # Every element of the rendered tree, containers included
+    yield node
+    for child in getattr(node, "children", {}).values():
+        yield from rendered(child)
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    # No background jobs and no Dune client
+    monkeypatch.setattr(scheduler, "start_background_refresh", lambda: None)
+
+    def no_client():
+        raise RuntimeError("Dune is not reachable in tests")
+    monkeypatch.setattr(dune_queries, "dune_client", no_client)
+
+
+@pytest.mark.parametrize("page", ["pages/4_eUSD_Price_Peg.py", "pages/5_FinTech_AUM.py"])
+def test_dune_key_is_not_rendered(offline, page):
+    at = AppTest.from_file(page, default_timeout=60)
+    at.secrets["DUNE_API_KEY"] = SECRET
+    at.run()
+    for node in rendered(at._tree):
+        proto = getattr(node, "proto", None)
+        assert SECRET not in str(proto or "")